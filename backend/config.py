@@ -1,19 +1,19 @@
 from dataclasses import dataclass, field
 from pathlib import Path
 
+# Resolved once at import; Path is immutable so it can be a plain default
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
 
 @dataclass(frozen=True)
 class Settings:
     # --- Paths ---
-    project_root: Path = field(default_factory=lambda: Path(__file__).resolve().parents[1])
-
-    @property
-    def data_dir(self) -> Path:
-        return self.project_root / "data" / "policies"
+    project_root: Path = _PROJECT_ROOT
 
-    @property
-    def chroma_dir(self) -> Path:
-        return self.project_root / "vector_store"
+    # Derived once in __post_init__ (not recomputed on every access)
+    data_dir: Path = field(init=False)
+    chroma_dir: Path = field(init=False)
+    model_cache_dir: Path = field(init=False)
 
     # --- ChromaDB ---
     collection_name: str = "policies"
@@ -32,6 +32,12 @@ class Settings:
     ollama_model: str = "llama3.1:8b"
     ollama_base_url: str = "http://localhost:11434"
 
+    def __post_init__(self) -> None:
+        # frozen=True blocks normal assignment, so set derived paths directly
+        object.__setattr__(self, "data_dir", self.project_root / "data" / "policies")
+        object.__setattr__(self, "chroma_dir", self.project_root / "vector_store")
+        object.__setattr__(self, "model_cache_dir", self.project_root / "model_cache")
+
 
 # Singleton settings object — import this everywhere
 settings = Settings()
\ No newline at end of file
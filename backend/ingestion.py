@@ -7,18 +7,37 @@ Both share the same core logic but this one is importable.
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import os
 import re
-import uuid
+from bisect import bisect_right
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from functools import lru_cache, partial
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Tuple
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 from sentence_transformers import SentenceTransformer
 
 from .config import settings
 
+EMBED_BATCH_SIZE = 64
+EMBED_BATCH_SIZE_GPU = 128
+ENCODE_WINDOW = 10000
+PARALLEL_MIN_FILES = 32
+READ_WORKERS = 8
+MANIFEST_NAME = "_ingest_manifest.json"
+
+_RE_BLANKS = re.compile(r"\n{3,}")
+_RE_SECTION_SPLIT = re.compile(r"\n(?=SECTION:)")
+_RE_CONTENT_START = re.compile(r"^[^\S\n]*(?:SECTION:|$)", re.MULTILINE)
+_RE_OTHER_LINE_BREAKS = re.compile("[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+_RE_SENTENCE_END = re.compile(r"\. ")
+
 
 # ------------------------------------------------------------------ #
 #  Chunking
@@ -30,19 +49,34 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
     - Keeps SECTION blocks together when possible
     - Falls back to sentence-boundary splitting for long sections
     """
-    text = re.sub(r"\n{3,}", "\n\n", text).strip()
+    # Clean files skip the regex scan entirely
+    if "\n\n\n" in text:
+        text = _RE_BLANKS.sub("\n\n", text)
+    text = text.strip()
+
+    # Strip front-matter: content starts at the first blank line OR first
+    # SECTION: line, found with one regex scan and kept as a single slice.
+    # Line breaks other than "\n" (which the old splitlines/join rewrote to
+    # "\n") are rare; those files keep the line-based path.
+    if _RE_OTHER_LINE_BREAKS.search(text):
+        lines = text.splitlines()
+        content_start = 0
+        for i, line in enumerate(lines):
+            if line.strip() == "" or line.strip().startswith("SECTION:"):
+                content_start = i
+                break
+        text = "\n".join(lines[content_start:]).strip()
+    else:
+        m = _RE_CONTENT_START.search(text)
+        if m:
+            text = text[m.start():].strip()
 
-    # Strip front-matter: skip lines until first blank line OR first SECTION:
-    lines = text.splitlines()
-    content_start = 0
-    for i, line in enumerate(lines):
-        if line.strip() == "" or line.strip().startswith("SECTION:"):
-            content_start = i
-            break
-    text = "\n".join(lines[content_start:]).strip()
+    # Fast path: short, single-section documents are one chunk
+    if len(text) <= max_chars and "SECTION:" not in text:
+        return [text] if text else []
 
     # Split on SECTION markers if present
-    sections = re.split(r"\n(?=SECTION:)", text) if "SECTION:" in text else [text]
+    sections = _RE_SECTION_SPLIT.split(text) if "SECTION:" in text else [text]
 
     chunks: List[str] = []
     for section in sections:
@@ -54,18 +88,23 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
             chunks.append(section)
             continue
 
-        # Long section → split with overlap
+        # Long section → split with overlap.
+        # Sentence ends are located once per section; each window then finds
+        # its last ". " by bisect instead of slicing the window and rfind-ing.
+        ends = [m.start() for m in _RE_SENTENCE_END.finditer(section)]
+        min_cut = int(max_chars * 0.7)
+        n = len(section)
         i = 0
-        while i < len(section):
-            chunk = section[i : i + max_chars]
+        while i < n:
+            end = i + max_chars
 
-            # Try to end at a sentence boundary
-            if i + max_chars < len(section):
-                last_period = chunk.rfind(". ")
-                if last_period > int(max_chars * 0.7):
-                    chunk = chunk[: last_period + 1]
+            # Try to end at a sentence boundary (last ". " fully inside the window)
+            if end < n:
+                j = bisect_right(ends, end - 2) - 1
+                if j >= 0 and ends[j] - i > min_cut:
+                    end = ends[j] + 1
 
-            chunk = chunk.strip()
+            chunk = section[i:end].strip()
             if chunk:
                 chunks.append(chunk)
 
@@ -77,10 +116,27 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
 # ------------------------------------------------------------------ #
 #  Metadata helpers
 # ------------------------------------------------------------------ #
+def _head_lines(text: str, limit: int) -> Iterator[str]:
+    """Yield up to `limit` lines from the top of text without splitting the rest."""
+    start = 0
+    for _ in range(limit):
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
 def parse_front_matter(text: str) -> Dict[str, str]:
     """Read KEY: VALUE lines from the top of a policy file."""
     meta: Dict[str, str] = {}
-    for line in text.splitlines()[:40]:
+
+    # Front matter ends at the first blank line (the same boundary chunk_text
+    # strips), so body lines that happen to contain ":" are never read as keys
+    for line in _head_lines(text, 40):
+        if not line.strip():
+            break
         if ":" not in line:
             continue
         k, v = line.split(":", 1)
@@ -119,6 +175,290 @@ def normalize_bool(val: str) -> bool:
     return str(val).strip().lower() in {"true", "yes", "1"}
 
 
+def chunk_id_hash(source_file: str, chunk_index: int, chunk: str) -> str:
+    """Stable 16-hex-char id suffix (same file + position + content -> same id)."""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(source_file.encode("utf-8"))
+    h.update(chunk_index.to_bytes(4, "little"))
+    # Whole chunk, so an id never outlives a content change (rerank cache keys on it)
+    h.update(chunk.encode("utf-8"))
+    return h.hexdigest()
+
+
+@dataclass(slots=True)
+class ChunkMeta:
+    """Per-chunk metadata; slots keep it compact until Chroma needs dicts."""
+
+    source_file: str
+    source: str
+    url: str
+    captured_on: str
+    authority: str
+    airline: str
+    domain: str
+    do_not_cite: bool
+    chunk_index: int = 0
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "source_file": self.source_file,
+            "source": self.source,
+            "url": self.url,
+            "captured_on": self.captured_on,
+            "authority": self.authority,
+            "airline": self.airline,
+            "domain": self.domain,
+            "do_not_cite": self.do_not_cite,
+            "chunk_index": self.chunk_index,
+        }
+
+
+# ------------------------------------------------------------------ #
+#  Embedder device selection
+# ------------------------------------------------------------------ #
+def select_device() -> str:
+    """
+    Pick the fastest available torch device: cuda > mps > cpu.
+    Override with env EMBED_DEVICE (e.g. "cpu" to force CPU).
+    """
+    forced = os.getenv("EMBED_DEVICE", "").strip().lower()
+    if forced:
+        return forced
+    try:
+        import torch  # type: ignore
+
+        if torch.cuda.is_available():
+            return "cuda"
+        mps = getattr(torch.backends, "mps", None)
+        if mps is not None and mps.is_available():
+            return "mps"
+    except Exception:
+        pass
+    return "cpu"
+
+
+def select_backend() -> str:
+    """
+    Embedder inference backend from env EMBED_BACKEND: "torch" (default),
+    "onnx" or "openvino". ONNX Runtime / OpenVINO fuse GELU/LayerNorm and use
+    oneDNN kernels, which speeds up the bulk passage encode.
+    """
+    return os.getenv("EMBED_BACKEND", "torch").strip().lower() or "torch"
+
+
+def _cpu_has_vnni() -> bool:
+    """True when /proc/cpuinfo advertises AVX-512 VNNI (int8 dot-product instructions)."""
+    try:
+        with open("/proc/cpuinfo", encoding="utf-8") as f:
+            return any(line.startswith("flags") and "avx512_vnni" in line.split() for line in f)
+    except OSError:
+        return False
+
+
+# ------------------------------------------------------------------ #
+#  Cached heavy resources (reused across /ingest calls)
+# ------------------------------------------------------------------ #
+@lru_cache(maxsize=4)
+def _get_embedder(
+    model_name: str, device: str, backend: str = "torch", quantized: bool = False
+) -> Tuple[SentenceTransformer, str]:
+    """
+    Returns (model, variant). The variant names what was actually loaded after
+    any fallback (e.g. "onnx-int8", "openvino-cpu", "torch-fp32-cpu"); the
+    manifest records it so vectors from different variants never mix.
+    """
+    if quantized:
+        if device == "cpu" and _cpu_has_vnni():
+            try:
+                return _load_quantized_embedder(model_name), "onnx-int8"
+            except Exception as e:
+                print(f"⚠️ Quantized embedder unavailable ({type(e).__name__}: {e}); using fp32", flush=True)
+        else:
+            print("⚠️ EMBED_QUANTIZED=1 needs a CPU with avx512_vnni; using fp32", flush=True)
+
+    if backend != "torch":
+        try:
+            return _load_exported_embedder(model_name, device, backend), f"{backend}-{device}"
+        except Exception as e:
+            print(f"⚠️ EMBED_BACKEND={backend} unavailable ({type(e).__name__}: {e}); using torch", flush=True)
+
+    if device == "cuda":
+        # FP16 halves matmul bandwidth on tensor cores; ingest casts outputs back
+        # to float32. Loading in fp16 directly skips the fp32 copy a later
+        # .half() would materialize on the GPU first.
+        import torch  # type: ignore
+
+        model = SentenceTransformer(model_name, device=device, model_kwargs={"torch_dtype": torch.float16})
+        return model, "torch-fp16"
+    return SentenceTransformer(model_name, device=device), f"torch-fp32-{device}"
+
+
+def _load_exported_embedder(model_name: str, device: str, backend: str) -> SentenceTransformer:
+    """
+    ONNX / OpenVINO embedder. The exported graph is saved under
+    settings.model_cache_dir on first use, so later runs skip the conversion.
+    Embeddings match the torch model up to numerical noise.
+    """
+    model_kwargs: Dict[str, object] = {}
+    if backend == "onnx":
+        model_kwargs["provider"] = "CUDAExecutionProvider" if device == "cuda" else "CPUExecutionProvider"
+
+    export_dir = settings.model_cache_dir / f"{model_name.replace('/', '__')}__{backend}"
+    if not (export_dir / "modules.json").exists():
+        model = SentenceTransformer(model_name, backend=backend, model_kwargs=model_kwargs)
+        model.save_pretrained(str(export_dir))
+
+    return SentenceTransformer(str(export_dir), backend=backend, model_kwargs=model_kwargs)
+
+
+def _load_quantized_embedder(model_name: str) -> SentenceTransformer:
+    """
+    Int8 dynamic-quantized ONNX embedder for CPU ingestion: GEMMs run as VNNI
+    int8 dot products. Exported once next to the fp32 ONNX export.
+    """
+    from sentence_transformers import export_dynamic_quantized_onnx_model
+
+    export_dir = settings.model_cache_dir / f"{model_name.replace('/', '__')}__onnx"
+    file_name = "onnx/model_qint8_avx512_vnni.onnx"
+
+    if not (export_dir / file_name).exists():
+        model = _load_exported_embedder(model_name, "cpu", "onnx")
+        export_dynamic_quantized_onnx_model(model, "avx512_vnni", str(export_dir))
+
+    return SentenceTransformer(
+        str(export_dir),
+        backend="onnx",
+        model_kwargs={"file_name": file_name, "provider": "CPUExecutionProvider"},
+    )
+
+
+@lru_cache(maxsize=4)
+def _get_client(persist_path: str) -> chromadb.PersistentClient:
+    return chromadb.PersistentClient(
+        path=persist_path,
+        settings=ChromaSettings(anonymized_telemetry=False),
+    )
+
+
+def _encode_passages(embedder: SentenceTransformer, chunks: List[str], device: str) -> np.ndarray:
+    """Embed chunks as e5 passages; returns an L2-normalized float32 matrix."""
+    passages = [f"passage: {c}" for c in chunks]
+    on_cpu = device == "cpu"
+    embeddings = embedder.encode(
+        passages,
+        batch_size=EMBED_BATCH_SIZE_GPU if device == "cuda" else EMBED_BATCH_SIZE,
+        show_progress_bar=False,
+        # On accelerators normalizing in-kernel is cheapest; on CPU we do it
+        # once below on the final float32 matrix instead.
+        normalize_embeddings=not on_cpu,
+        convert_to_numpy=True,
+    )
+    # Keep one contiguous float32 matrix (fp16 output is upcast here); Chroma
+    # accepts ndarrays directly, so no per-float Python list is materialized
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if on_cpu:
+        embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12
+    return embeddings
+
+
+# ------------------------------------------------------------------ #
+#  Per-file parsing
+# ------------------------------------------------------------------ #
+def _process_file(
+    file_path: Path,
+    policies_root: Path,
+    max_chars: int,
+    overlap: int,
+) -> Tuple[List[str], ChunkMeta] | None:
+    """Read, parse and chunk one policy file. Returns None when it yields nothing."""
+    raw = file_path.read_text(encoding="utf-8", errors="ignore").strip()
+    if not raw:
+        return None
+
+    front = parse_front_matter(raw)
+    path_md = infer_path_metadata(file_path, policies_root)
+
+    do_not_cite = normalize_bool(front.get("do_not_cite", "")) or bool(
+        path_md.get("do_not_cite", False)
+    )
+
+    # FIXED: Normalize airline to lowercase for consistent filtering
+    # This ensures "Delta Airlines" from user matches "delta airlines" in DB
+    airline_raw = front.get("airline") or str(path_md.get("airline") or "")
+    airline_normalized = airline_raw.strip().lower()
+
+    metadata_base = ChunkMeta(
+        source_file=str(file_path).replace("\\", "/"),
+        source=front.get("source") or "",
+        url=front.get("url") or "",
+        captured_on=front.get("captured_on") or "",
+        authority=front.get("authority") or str(path_md.get("authority") or ""),
+        airline=airline_normalized,  # FIXED: was inline .lower() that wasn't clear
+        domain=front.get("domain") or str(path_md.get("domain") or ""),
+        do_not_cite=do_not_cite,
+    )
+
+    chunks = chunk_text(raw, max_chars=max_chars, overlap=overlap)
+    if not chunks:
+        return None
+    return chunks, metadata_base
+
+
+# ------------------------------------------------------------------ #
+#  Chroma writes
+# ------------------------------------------------------------------ #
+def _upsert_window(
+    collection,
+    add_batch: int,
+    chunks: List[str],
+    ids: List[str],
+    metas: List[ChunkMeta],
+    embeddings: np.ndarray,
+) -> None:
+    """Write one encoded window in add_batch-sized upserts."""
+    # Ids are deterministic, so upsert keeps a retried run from duplicating rows.
+    for start in range(0, len(chunks), add_batch):
+        end = start + add_batch
+        collection.upsert(
+            ids=ids[start:end],
+            documents=chunks[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=[m.to_dict() for m in metas[start:end]],
+        )
+
+
+# ------------------------------------------------------------------ #
+#  Incremental-ingest manifest
+# ------------------------------------------------------------------ #
+def _load_manifest(manifest_path: Path) -> Dict[str, object]:
+    try:
+        return json.loads(manifest_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(manifest_path: Path, manifest: Dict[str, object]) -> None:
+    tmp = manifest_path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True), encoding="utf-8")
+    os.replace(tmp, manifest_path)
+
+
+def _fingerprint(
+    file_path: Path, previous: Dict[str, object] | None
+) -> Tuple[Dict[str, object], bool]:
+    """
+    Return (fingerprint, changed). mtime+size short-circuits the check;
+    the sha1 is only recomputed when those differ (e.g. a touched file).
+    """
+    st = file_path.stat()
+    if previous and previous.get("mtime") == st.st_mtime and previous.get("size") == st.st_size:
+        return previous, False
+
+    sha1 = hashlib.sha1(file_path.read_bytes()).hexdigest()
+    fingerprint = {"mtime": st.st_mtime, "size": st.st_size, "sha1": sha1}
+    return fingerprint, not previous or previous.get("sha1") != sha1
+
+
 # ------------------------------------------------------------------ #
 #  Main ingestion function
 # ------------------------------------------------------------------ #
@@ -129,11 +469,17 @@ def ingest_policies(
     embed_model: str | None = None,
     max_chars: int = 900,
     overlap: int = 150,
+    force: bool = False,
 ) -> Dict[str, int]:
     """
     Ingest all .txt policy files into ChromaDB.
     Uses settings defaults when parameters are not provided.
-    Returns {"ingested_files": N, "ingested_chunks": N}
+
+    Incremental by default: files whose (mtime, size, sha1) fingerprint matches
+    the manifest from the last run are skipped; changed or removed files have
+    their old chunks deleted first. force=True wipes and rebuilds the collection.
+
+    Returns {"ingested_files": N, "ingested_chunks": N, "unchanged_files": N}
     """
     policies_root = Path(policies_dir or settings.data_dir)
     persist_path = str(persist_dir or settings.chroma_dir)
@@ -147,79 +493,129 @@ def ingest_policies(
 
     os.makedirs(persist_path, exist_ok=True)
 
-    client = chromadb.PersistentClient(
-        path=persist_path,
-        settings=ChromaSettings(anonymized_telemetry=False),
-    )
-
-    # Delete and recreate collection for a clean re-ingest
-    try:
-        client.delete_collection(col_name)
-    except Exception:
-        pass
+    client = _get_client(persist_path)
+
+    device = select_device()
+    backend = select_backend()
+    # EMBED_QUANTIZED=1: int8 ONNX passages on VNNI CPUs (queries stay fp32)
+    quantized = os.getenv("EMBED_QUANTIZED", "0").strip() == "1"
+
+    # The variant actually loaded (after any fallback) goes in the manifest, so
+    # the embedder is loaded before the diff; lru_cache makes later runs free.
+    embedder, variant = _get_embedder(model_name, device, backend, quantized)
+
+    # Chunking/embedding settings are part of the manifest: changing them
+    # invalidates every stored chunk, so fall back to a full rebuild. That
+    # includes the embedder variant, so int8/ONNX/fp16/fp32 vectors never mix
+    # in one collection.
+    manifest_path = Path(persist_path) / MANIFEST_NAME
+    ingest_config = {
+        "collection": col_name,
+        "embed_model": model_name,
+        "embedder": variant,
+        "max_chars": max_chars,
+        "overlap": overlap,
+    }
+    manifest = {} if force else _load_manifest(manifest_path)
+    full_rebuild = manifest.get("config") != ingest_config
+    old_files: Dict[str, Dict[str, object]] = {} if full_rebuild else manifest.get("files", {})
+
+    if full_rebuild:
+        # Delete and recreate collection for a clean re-ingest
+        try:
+            client.delete_collection(col_name)
+        except Exception:
+            pass
 
     collection = client.get_or_create_collection(
         name=col_name,
         metadata={"hnsw:space": "cosine"},
     )
 
-    embedder = SentenceTransformer(model_name)
+    # Diff current files against the manifest
+    files = sorted(policies_root.rglob("*.txt"))
+    new_files: Dict[str, Dict[str, object]] = {}
+    to_process: List[Path] = []
+    stale: List[str] = []
+    for file_path in files:
+        source_file = str(file_path).replace("\\", "/")
+        fingerprint, changed = _fingerprint(file_path, old_files.get(source_file))
+        new_files[source_file] = fingerprint
+        if changed:
+            to_process.append(file_path)
+            if source_file in old_files:
+                stale.append(source_file)
+
+    # Drop chunks for files that changed or disappeared since the last run
+    stale += [f for f in old_files if f not in new_files]
+    for source_file in stale:
+        collection.delete(where={"source_file": source_file})
 
     files_ingested = 0
-    chunks_ingested = 0
-
-    for file_path in sorted(policies_root.rglob("*.txt")):
-        raw = file_path.read_text(encoding="utf-8", errors="ignore").strip()
-        if not raw:
-            continue
 
-        front = parse_front_matter(raw)
-        path_md = infer_path_metadata(file_path, policies_root)
+    # Pass 1: read + chunk every changed file (no embedding yet)
+    all_chunks: List[str] = []
+    all_meta: List[ChunkMeta] = []
+    all_ids: List[str] = []
 
-        do_not_cite = normalize_bool(front.get("do_not_cite", "")) or bool(
-            path_md.get("do_not_cite", False)
-        )
-
-        # FIXED: Normalize airline to lowercase for consistent filtering
-        # This ensures "Delta Airlines" from user matches "delta airlines" in DB
-        airline_raw = front.get("airline") or str(path_md.get("airline") or "")
-        airline_normalized = airline_raw.strip().lower()
-
-        metadata_base = {
-            "source_file": str(file_path).replace("\\", "/"),
-            "source": front.get("source") or "",
-            "url": front.get("url") or "",
-            "captured_on": front.get("captured_on") or "",
-            "authority": front.get("authority") or str(path_md.get("authority") or ""),
-            "airline": airline_normalized,  # FIXED: was inline .lower() that wasn't clear
-            "domain": front.get("domain") or str(path_md.get("domain") or ""),
-            "do_not_cite": do_not_cite,
-        }
+    process = partial(
+        _process_file, policies_root=policies_root, max_chars=max_chars, overlap=overlap
+    )
+    if len(to_process) >= PARALLEL_MIN_FILES:
+        # Threads, not processes: this runs inside the /ingest handler, and
+        # forking a multithreaded uvicorn process with torch loaded can
+        # deadlock. Parsing is cheap; the threads overlap the file reads.
+        with ThreadPoolExecutor(max_workers=READ_WORKERS) as ex:
+            results = list(ex.map(process, to_process))
+    else:
+        results = [process(f) for f in to_process]
 
-        chunks = chunk_text(raw, max_chars=max_chars, overlap=overlap)
-        if not chunks:
+    for file_path, result in zip(to_process, results):
+        if result is None:
             continue
+        chunks, metadata_base = result
 
-        passages = [f"passage: {c}" for c in chunks]
-        embeddings = embedder.encode(passages, normalize_embeddings=True).tolist()
-
-        ids, metadatas, documents = [], [], []
-        for i, (chunk, _emb) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{file_path.stem}__{i}__{uuid.uuid4().hex[:8]}"
-            ids.append(chunk_id)
-            md = dict(metadata_base)
-            md["chunk_index"] = i
-            metadatas.append(md)
-            documents.append(chunk)
-
-        collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
+        source_file = metadata_base.source_file
+        all_ids.extend(
+            f"{file_path.stem}__{i}__{chunk_id_hash(source_file, i, chunk)}"
+            for i, chunk in enumerate(chunks)
         )
+        all_meta.extend(replace(metadata_base, chunk_index=i) for i in range(len(chunks)))
+        all_chunks.extend(chunks)
 
         files_ingested += 1
-        chunks_ingested += len(chunks)
 
-    return {"ingested_files": files_ingested, "ingested_chunks": chunks_ingested}
\ No newline at end of file
+    if all_chunks:
+        # Pass 2: encode across files in large windows (full batches even when
+        # files are small), flushing each window to Chroma so peak embedding
+        # memory stays bounded at ENCODE_WINDOW rows.
+        # Each upsert is one SQLite transaction: write a whole window per call
+        # unless this Chroma build caps rows per request lower
+        add_batch = max(1, min(ENCODE_WINDOW, client.get_max_batch_size()))
+
+        # Pipeline: one writer thread upserts window k while this thread
+        # encodes window k+1, hiding SQLite commit latency behind the model.
+        # At most one window is in flight, so writes stay strictly ordered and
+        # peak memory is two windows of embeddings.
+        pending: Future | None = None
+        with ThreadPoolExecutor(max_workers=1) as writer:
+            for w_start in range(0, len(all_chunks), ENCODE_WINDOW):
+                w_end = w_start + ENCODE_WINDOW
+                chunks, ids, metas = all_chunks[w_start:w_end], all_ids[w_start:w_end], all_meta[w_start:w_end]
+                embeddings = _encode_passages(embedder, chunks, device)
+
+                if pending is not None:
+                    pending.result()  # re-raises a failed write before queueing more
+                pending = writer.submit(_upsert_window, collection, add_batch, chunks, ids, metas, embeddings)
+
+            if pending is not None:
+                pending.result()
+
+    # Only record the new state once Chroma has accepted every chunk
+    _save_manifest(manifest_path, {"config": ingest_config, "files": new_files})
+
+    return {
+        "ingested_files": files_ingested,
+        "ingested_chunks": len(all_chunks),
+        "unchanged_files": len(files) - len(to_process),
+    }
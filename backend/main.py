@@ -12,6 +12,8 @@ Fixes added (NO retrieval-quality change):
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional
+import asyncio
+import re
 import time
 
 from fastapi import FastAPI
@@ -27,6 +29,7 @@ from .ollama_client import (
     OLLAMA_MODEL as ACTIVE_OLLAMA_MODEL,
     generate as ollama_generate,
     generate_stream,
+    warm_connection,
 )
 from .slots import (
     detect_case,
@@ -98,25 +101,29 @@ def _user_only_text(turns: List[ChatTurn]) -> List[str]:
     return [t.content for t in turns if t.role == "user"]
 
 
+_NEW_ISSUE_MARKERS = (
+    "new issue",
+    "new problem",
+    "different problem",
+    "different issue",
+    "change topic",
+    "another question",
+    "separate issue",
+    "unrelated",
+    "by the way",
+    "also i have",
+    "now about",
+)
+# One compiled alternation = a single C-level scan instead of 11 substring checks
+_NEW_ISSUE_RE = re.compile("|".join(map(re.escape, _NEW_ISSUE_MARKERS)))
+
+
 def _is_new_issue(current_msg: str, user_history: List[str]) -> bool:
     if not user_history:
         return True
 
     msg_lower = current_msg.lower().strip()
-    markers = [
-        "new issue",
-        "new problem",
-        "different problem",
-        "different issue",
-        "change topic",
-        "another question",
-        "separate issue",
-        "unrelated",
-        "by the way",
-        "also i have",
-        "now about",
-    ]
-    if any(m in msg_lower for m in markers):
+    if _NEW_ISSUE_RE.search(msg_lower):
         return True
 
     current_airline = detect_airline(current_msg)
@@ -138,31 +145,29 @@ def _get_relevant_context(current_msg: str, user_history: List[str], max_tokens:
     return full.strip()
 
 
+# Any non-"user" role is rendered as the assistant
+_ROLE_PREFIX = {"user": "User: ", "assistant": "Assistant: "}
+
+
 def _flatten_transcript(turns: List[ChatTurn], max_turns: int = 12) -> str:
-    turns = turns[-max_turns:]
-    lines = []
-    for t in turns:
-        role = "User" if t.role == "user" else "Assistant"
-        lines.append(f"{role}: {t.content}")
-    return "\n".join(lines).strip()
+    return "\n".join(
+        _ROLE_PREFIX.get(t.role, "Assistant: ") + t.content for t in turns[-max_turns:]
+    ).strip()
+
+
+_CITATION_META_KEYS = ("source", "airline", "authority", "domain", "url")
 
 
 def _build_citations(top_chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    out = []
-    for c in top_chunks:
-        out.append(
-            {
-                "source": c["meta"].get("source", ""),
-                "airline": c["meta"].get("airline", ""),
-                "authority": c["meta"].get("authority", ""),
-                "domain": c["meta"].get("domain", ""),
-                "url": c["meta"].get("url", ""),
-                "chunk_id": c["id"],
-                "rerank_score": round(float(c.get("rerank_score", 0.0)), 4),
-                "excerpt": (c["doc"][:600] or ""),
-            }
-        )
-    return out
+    return [
+        {
+            **{k: c["meta"].get(k, "") for k in _CITATION_META_KEYS},
+            "chunk_id": c["id"],
+            "rerank_score": round(float(c.get("rerank_score", 0.0)), 4),
+            "excerpt": (c["doc"][:600] or ""),
+        }
+        for c in top_chunks
+    ]
 
 
 def _fallback_answer(top_chunks: List[Dict[str, Any]], confidence: str) -> str:
@@ -179,33 +184,8 @@ def _fallback_answer(top_chunks: List[Dict[str, Any]], confidence: str) -> str:
     return header + "\n\n---\n\n".join(parts)
 
 
-def _build_prompt(
-    user_msg: str,
-    decision: Any,
-    top_chunks: List[Dict[str, Any]],
-    confidence: str,
-    slots: Dict[str, Any],
-    turns: List[ChatTurn],
-) -> str:
-    evidence_lines = []
-    for i, c in enumerate(top_chunks[:4], 1):
-        meta = c["meta"]
-        airline_display = (
-            meta.get("airline", "").title()
-            if meta.get("airline") not in ("dot", "internal")
-            else meta.get("airline", "").upper()
-        )
-
-        # FIX 1: smaller evidence snippets (speed; no retrieval quality change)
-        snippet = (c["doc"] or "").strip()[:120]
-        evidence_lines.append(f"[{i}] {airline_display} {meta.get('domain','')}:\n{snippet}")
-
-    # FIX 1: fewer turns (speed; preserves context)
-    transcript = _flatten_transcript(turns, max_turns=6)
-
-    situation = getattr(decision, "recommended_action", "")
-
-    return f"""You are an expert airline dispute assistant. Interpret policies and explain what they mean for this passenger.
+# Prompt layout lives in one module-level template; _build_prompt only fills it in
+PROMPT_TEMPLATE = """You are an expert airline dispute assistant. Interpret policies and explain what they mean for this passenger.
 
 CURRENT QUESTION: "{user_msg}"
 
@@ -216,7 +196,7 @@ SITUATION ANALYSIS:
 {situation}
 
 POLICY EVIDENCE:
-{chr(10).join(evidence_lines)}
+{evidence}
 
 INSTRUCTIONS:
 - Give 2–3 concrete next steps and why
@@ -224,7 +204,35 @@ INSTRUCTIONS:
 - Be conversational (4–6 sentences)
 - Don't ask for info already known
 
-Answer:""".strip()
+Answer:"""
+
+
+def _airline_display(meta: Dict[str, Any]) -> str:
+    airline = meta.get("airline", "")
+    return airline.upper() if airline in ("dot", "internal") else airline.title()
+
+
+def _build_prompt(
+    user_msg: str,
+    decision: Any,
+    top_chunks: List[Dict[str, Any]],
+    confidence: str,
+    slots: Dict[str, Any],
+    turns: List[ChatTurn],
+) -> str:
+    # FIX 1: smaller evidence snippets (speed; no retrieval quality change)
+    evidence = "\n".join(
+        f"[{i}] {_airline_display(c['meta'])} {c['meta'].get('domain', '')}:\n{(c['doc'] or '').strip()[:120]}"
+        for i, c in enumerate(top_chunks[:4], 1)
+    )
+
+    return PROMPT_TEMPLATE.format(
+        user_msg=user_msg,
+        # FIX 1: fewer turns (speed; preserves context)
+        transcript=_flatten_transcript(turns, max_turns=6),
+        situation=getattr(decision, "recommended_action", ""),
+        evidence=evidence,
+    ).strip()
 
 
 def _clarify_json(case: str, slots: Dict[str, Any], missing: List[str]) -> Dict[str, Any]:
@@ -262,6 +270,13 @@ def _search_with_airline_fallback(query: str, airline_filter: str | None) -> tup
     return chunks, score, used_filter or "none"
 
 
+def _analyze_context(user_msg: str, turns: List[ChatTurn]) -> tuple[str, Dict[str, Any]]:
+    """Pure-CPU string work (context window, case, slots); run off the event loop."""
+    context = _get_relevant_context(user_msg, _user_only_text(turns), max_tokens=2000)
+    case = detect_case(context)
+    return case, extract_slots(context, case)
+
+
 # -----------------------------
 # Endpoints
 # -----------------------------
@@ -278,21 +293,20 @@ def health():
 
 
 @app.post("/ingest")
-def ingest():
-    result = ingest_policies()
+def ingest(force: bool = False):
+    result = ingest_policies(force=force)
+    # Collection may have been recreated and its rows changed; drop cached state
+    retriever.reload()
     return {"status": "ok", **result}
 
 
 @app.post("/chat")
-def chat(req: ChatRequest):
+async def chat(req: ChatRequest):
     user_msg = (req.message or "").strip()
     turns = _safe_turns(req.conversation_history)
 
-    user_history = _user_only_text(turns)
-    context = _get_relevant_context(user_msg, user_history, max_tokens=2000)
-
-    case = detect_case(context)
-    slots = extract_slots(context, case)
+    # One worker-thread hop for all slot work keeps the event loop free for other streams
+    case, slots = await asyncio.to_thread(_analyze_context, user_msg, turns)
 
     miss = missing_slots(slots)
     if miss:
@@ -301,7 +315,9 @@ def chat(req: ChatRequest):
     query = build_retrieval_query(user_msg, slots)
 
     airline_filter = (slots.get("airline") or "").strip()
-    top_chunks, top_score, used_filter = _search_with_airline_fallback(query, airline_filter)
+    top_chunks, top_score, used_filter = await asyncio.to_thread(
+        _search_with_airline_fallback, query, airline_filter
+    )
 
     if top_score < 0.15:
         return _low_match_json(case, slots, query, top_score)
@@ -312,7 +328,9 @@ def chat(req: ChatRequest):
     try:
         prompt = _build_prompt(user_msg, decision, top_chunks, confidence, slots, turns)
         # FIX 3: num_predict lowered
-        answer = ollama_generate(prompt, timeout_s=240, num_predict=350, temperature=0.4)
+        answer = await asyncio.to_thread(
+            ollama_generate, prompt, timeout_s=240, num_predict=350, temperature=0.4
+        )
         if not answer.strip():
             raise RuntimeError("empty answer")
         used_llm = True
@@ -342,18 +360,14 @@ def chat(req: ChatRequest):
 
 
 @app.post("/chat_stream")
-def chat_stream(req: ChatRequest):
+async def chat_stream(req: ChatRequest):
     t0 = time.time()
     print("[TIMING] /chat_stream called", flush=True)
 
     user_msg = (req.message or "").strip()
     turns = _safe_turns(req.conversation_history)
 
-    user_history = _user_only_text(turns)
-    context = _get_relevant_context(user_msg, user_history, max_tokens=2000)
-
-    case = detect_case(context)
-    slots = extract_slots(context, case)
+    case, slots = await asyncio.to_thread(_analyze_context, user_msg, turns)
 
     miss = missing_slots(slots)
     if miss:
@@ -363,7 +377,12 @@ def chat_stream(req: ChatRequest):
     query = build_retrieval_query(user_msg, slots)
 
     airline_filter = (slots.get("airline") or "").strip()
-    top_chunks, top_score, used_filter = _search_with_airline_fallback(query, airline_filter)
+    # Warm the LLM socket while retrieval+rerank runs, so the stream POST skips the
+    # handshake. Fire-and-forget: the response never waits on the warm-up itself.
+    asyncio.get_running_loop().run_in_executor(None, warm_connection)
+    top_chunks, top_score, used_filter = await asyncio.to_thread(
+        _search_with_airline_fallback, query, airline_filter
+    )
 
     t_retrieval = time.time()
     print(
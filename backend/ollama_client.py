@@ -4,7 +4,8 @@ from typing import Optional, Iterator, Dict, Any
 import os
 import time
 
-from groq import Groq
+import httpx
+from groq import DefaultHttpxClient, Groq
 
 # Keep these for backward compatibility (main.py reads OLLAMA_MODEL for /health)
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434").rstrip("/")
@@ -21,7 +22,51 @@ if not _GROQ_API_KEY:
 # Let you override Groq model without changing code
 GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 
-_CLIENT = Groq(api_key=_GROQ_API_KEY)
+
+def _http_client() -> httpx.Client:
+    """
+    One long-lived pooled client so every chat reuses a warm TLS connection.
+    HTTP/2 is used when the optional `h2` package is installed.
+    """
+    try:
+        import h2  # type: ignore  # noqa: F401
+        http2 = True
+    except ImportError:
+        http2 = False
+
+    # DefaultHttpxClient keeps the SDK defaults (follow_redirects, ...); keep its
+    # 5s connect timeout so an unreachable host still fails fast
+    return DefaultHttpxClient(
+        http2=http2,
+        limits=httpx.Limits(max_keepalive_connections=32, keepalive_expiry=300.0),
+        timeout=httpx.Timeout(180.0, connect=5.0),
+    )
+
+
+_HTTP_CLIENT = _http_client()
+_CLIENT = Groq(api_key=_GROQ_API_KEY, http_client=_HTTP_CLIENT)
+
+
+# Skip the warm-up while a recent one is still well inside keepalive_expiry
+_WARM_INTERVAL_S = 60.0
+_last_warm = 0.0
+
+
+def warm_connection(timeout_s: float = 2.0) -> None:
+    """
+    Best-effort speculative connect: a tiny HEAD to the Groq host opens the
+    TCP/TLS session in the keepalive pool so the next completion skips the
+    handshake. The status code is irrelevant; failures are ignored.
+    """
+    global _last_warm
+    now = time.monotonic()
+    if now - _last_warm < _WARM_INTERVAL_S:
+        return
+    _last_warm = now
+    try:
+        _HTTP_CLIENT.head(str(_CLIENT.base_url), timeout=timeout_s)
+    except Exception:
+        pass
 
 
 def _payload(
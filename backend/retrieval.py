@@ -8,19 +8,28 @@ Two-stage retrieval pipeline:
 Fixes (NO retrieval-quality change):
 - Warmup to avoid first-user-query latency spikes
 - Exact-match caches:
-  * query embedding cache
-  * reranker pair cache (query, doc[:500])
+  * query embedding cache (functools.lru_cache, C-level)
+  * reranker score cache (query, chunk id)
 - Optional torch thread tuning via env TORCH_NUM_THREADS (speed only)
+- Exact in-memory dense search (one float32 matmul) for collections up to
+  IN_MEMORY_MAX_CHUNKS rows; larger collections still use Chroma's HNSW
+- Optional cross-encoder skip on a decisive dense top-1 (RERANK_SKIP_ON_MARGIN)
+- Model inference gated by RERANK_MAX_CONCURRENCY (default 1) to avoid
+  CPU thread oversubscription under concurrent requests
 """
 
 from __future__ import annotations
 
 from typing import Any, Dict, List, Optional, Tuple
 from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import lru_cache
+import heapq
 import threading
 import os
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings as ChromaSettings
 from sentence_transformers import CrossEncoder, SentenceTransformer
 
@@ -50,6 +59,33 @@ class _LRUCache:
             while len(self._data) > self.maxsize:
                 self._data.popitem(last=False)
 
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_NOT_LOADED = object()
+
+
+@dataclass(frozen=True)
+class _Corpus:
+    """One consistent in-memory snapshot of the collection (never mutated after load)."""
+
+    E: np.ndarray                 # [N, D] float32, L2-normalized rows
+    ids: Tuple[str, ...]
+    docs: Tuple[str, ...]
+    metas: Tuple[Dict[str, Any], ...]
+    airlines: np.ndarray
+    # Per-snapshot memo of airline -> row mask (a racing miss just recomputes it)
+    masks: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def airline_mask(self, airline: str) -> np.ndarray:
+        mask = self.masks.get(airline)
+        if mask is None:
+            mask = self.airlines == airline
+            self.masks[airline] = mask
+        return mask
+
 
 class Retriever:
     """
@@ -63,11 +99,35 @@ class Retriever:
         self._embedder = None
         self._reranker = None
 
-        self._emb_cache = _LRUCache(maxsize=2048)       # key: "query: <q>" -> embedding
-        self._rerank_cache = _LRUCache(maxsize=10000)   # key: (q, doc500) -> score
+        # C-level functools LRU over the prefixed query -> float32 ndarray
+        self._embed_cached = lru_cache(maxsize=2048)(self._encode_query)
+        self._rerank_cache = _LRUCache(maxsize=10000)   # key: (q, chunk_id) -> score
 
         self._torch_threads = int(os.getenv("TORCH_NUM_THREADS", "0"))
 
+        # Concurrent predict()/encode() calls each spawn torch worker threads and
+        # thrash the cores; gate model inference (cache hits stay ungated).
+        self._infer_sem = threading.BoundedSemaphore(
+            max(1, int(os.getenv("RERANK_MAX_CONCURRENCY", "1")))
+        )
+
+
+        # TORCH_COMPILE=1: torch.compile the transformer forward passes
+        self._torch_compile = os.getenv("TORCH_COMPILE", "0").strip() == "1"
+
+        # RERANK_SKIP_ON_MARGIN=<ratio>: skip the cross-encoder when the dense top-1
+        # distance beats the runner-up by more than this factor (0 = always rerank)
+        self._skip_margin = float(os.getenv("RERANK_SKIP_ON_MARGIN", "0"))
+
+        # In-memory corpus: collections up to IN_MEMORY_MAX_CHUNKS rows are held as one
+        # float32 matrix and searched exactly with a single matmul (no HNSW round-trip)
+        self._in_memory_max = int(os.getenv("IN_MEMORY_MAX_CHUNKS", "50000"))
+        # _corpus is swapped with one assignment (never mutated field by field), so a
+        # reader's local snapshot stays consistent across a concurrent reload().
+        # _NOT_LOADED -> load on next use; None -> empty/too large, query Chroma.
+        self._corpus_lock = threading.Lock()
+        self._corpus: Any = _NOT_LOADED
+
     # -----------------------------
     # Lazy model loading
     # -----------------------------
@@ -94,6 +154,9 @@ class Retriever:
         if self._embedder is None:
             self._embedder = SentenceTransformer(settings.embed_model)
             self._apply_torch_threads()
+            if self._torch_compile:
+                first = self._embedder._first_module()
+                first.auto_model = self._compile(first.auto_model)
         return self._embedder
 
     @property
@@ -101,6 +164,8 @@ class Retriever:
         if self._reranker is None:
             self._reranker = CrossEncoder(settings.reranker_model)
             self._apply_torch_threads()
+            if self._torch_compile:
+                self._reranker.model = self._compile(self._reranker.model)
         return self._reranker
 
     def _apply_torch_threads(self) -> None:
@@ -111,6 +176,97 @@ class Retriever:
             except Exception:
                 pass
 
+    @staticmethod
+    def _compile(module: Any) -> Any:
+        """torch.compile a module; returns it unchanged if compilation is unavailable."""
+        try:
+            import torch  # type: ignore
+
+            # CUDA graphs ("reduce-overhead") only pay off on GPU
+            mode = "reduce-overhead" if torch.cuda.is_available() else "default"
+            return torch.compile(module, mode=mode, dynamic=True)
+        except Exception:
+            return module
+
+    def reload(self) -> None:
+        """Drop the cached collection handle and in-memory corpus (call after re-ingest)."""
+        with self._corpus_lock:
+            self._collection = None
+            self._corpus = _NOT_LOADED
+            # Rerank scores are keyed by chunk id; ids can now point at new content
+            self._rerank_cache.clear()
+
+    # -----------------------------
+    # In-memory corpus (exact search)
+    # -----------------------------
+    def _load_corpus(self) -> Optional[_Corpus]:
+        """
+        Load every stored embedding into one contiguous float32 matrix.
+        Returns a snapshot to use for the whole query, or None when the
+        collection is empty or too large, in which case retrieve() queries
+        Chroma instead.
+        """
+        corpus = self._corpus
+        if corpus is _NOT_LOADED:
+            with self._corpus_lock:
+                corpus = self._corpus
+                if corpus is _NOT_LOADED:
+                    corpus = None
+                    count = self.collection.count()
+                    if 0 < count <= self._in_memory_max:
+                        res = self.collection.get(include=["embeddings", "metadatas", "documents"])
+                        metas = tuple(m or {} for m in res["metadatas"])
+                        corpus = _Corpus(
+                            E=np.ascontiguousarray(np.asarray(res["embeddings"], dtype=np.float32)),
+                            ids=tuple(res["ids"]),
+                            docs=tuple(res["documents"]),
+                            metas=metas,
+                            airlines=np.array([m.get("airline", "") for m in metas]),
+                        )
+                    self._corpus = corpus
+        return corpus
+
+    @staticmethod
+    def _top_k_stable(scores: np.ndarray, k: int) -> np.ndarray:
+        """
+        Indices of the k best scores, best first, ties broken by row index:
+        the same result as np.argsort(-scores, kind="stable")[:k], but O(N).
+        The k-th best value comes from a partition; rows tied at it are taken
+        in index order instead of whatever order argpartition leaves them.
+        """
+        kth = np.partition(scores, scores.size - k)[scores.size - k]
+        above = np.flatnonzero(scores > kth)
+        tied = np.flatnonzero(scores == kth)[: k - above.size]
+        top = np.concatenate((above, tied))
+        return top[np.argsort(-scores[top], kind="stable")]
+
+    def _retrieve_in_memory(
+        self, corpus: _Corpus, q_emb: np.ndarray, k: int, airline: str | None
+    ) -> List[Dict[str, Any]]:
+        # Rows are normalized, so E @ q is cosine similarity; Chroma's cosine
+        # distance is 1 - similarity, which is what "distance" has always held
+        scores = corpus.E @ q_emb
+
+        rows = np.flatnonzero(corpus.airline_mask(airline)) if airline else None
+        cand_scores = scores[rows] if rows is not None else scores
+        if cand_scores.size == 0:
+            return []
+
+        k = min(k, cand_scores.size)
+        top = self._top_k_stable(cand_scores, k)
+        if rows is not None:
+            top = rows[top]
+
+        return [
+            {
+                "id": corpus.ids[i],
+                "doc": corpus.docs[i],
+                "meta": corpus.metas[i],
+                "distance": float(1.0 - scores[i]),
+            }
+            for i in top.tolist()
+        ]
+
     # -----------------------------
     # Warmup (speed only)
     # -----------------------------
@@ -120,23 +276,28 @@ class Retriever:
         No effect on outputs.
         """
         try:
+            self._load_corpus()
             _ = self._embed_query("warmup")
-            _ = self.reranker.predict([("warmup", "warmup")])
+            # Realistic doc length (rerank uses doc[:500]) so compiled graphs are primed
+            _ = self.reranker.predict([("warmup", "warmup " * 71)])
         except Exception:
             pass
 
     # -----------------------------
     # Stage 1: Dense retrieval
     # -----------------------------
-    def _embed_query(self, query: str) -> List[float]:
-        prefixed_query = f"query: {query}"
-
-        cached = self._emb_cache.get(prefixed_query)
-        if cached is not None:
-            return cached
-
-        emb = self.embedder.encode([prefixed_query], normalize_embeddings=True).tolist()[0]
-        self._emb_cache.set(prefixed_query, emb)
+    def _embed_query(self, query: str) -> np.ndarray:
+        return self._embed_cached(f"query: {query}")
+
+    def _encode_query(self, prefixed_query: str) -> np.ndarray:
+        with self._infer_sem:
+            emb = self.embedder.encode(
+                [prefixed_query], normalize_embeddings=True, convert_to_numpy=True
+            )[0]
+        # Compact float32 vector (~3 kB) instead of 768 boxed Python floats;
+        # read-only so a cached entry can't be mutated by a caller
+        emb = np.ascontiguousarray(emb, dtype=np.float32)
+        emb.flags.writeable = False
         return emb
 
     def retrieve(
@@ -148,9 +309,14 @@ class Retriever:
         k = top_k or settings.retrieval_top_k
         q_emb = self._embed_query(query)
 
+        airline_normalized = airline_filter.strip().lower() if airline_filter else None
+
+        corpus = self._load_corpus()
+        if corpus is not None:
+            return self._retrieve_in_memory(corpus, q_emb, k, airline_normalized)
+
         where = None
-        if airline_filter:
-            airline_normalized = airline_filter.strip().lower()
+        if airline_normalized:
             where = {"airline": {"$eq": airline_normalized}}
 
         res = self.collection.query(
@@ -186,41 +352,62 @@ class Retriever:
         if not candidates:
             return []
 
-        # Keep same rerank context length (500) => no quality reduction
-        doc500_list = [c["doc"][:500] for c in candidates]
-
         scores: List[Optional[float]] = [None] * len(candidates)
         uncached_pairs: List[Tuple[str, str]] = []
         uncached_idx: List[int] = []
 
-        for i, doc500 in enumerate(doc500_list):
-            key = (query, doc500)
-            cached = self._rerank_cache.get(key)
+        # Chunks are immutable per id (cache is cleared on reload), so key by
+        # (query, chunk id) instead of hashing a 500-char doc prefix per candidate
+        for i, c in enumerate(candidates):
+            cached = self._rerank_cache.get((query, c["id"]))
             if cached is not None:
                 scores[i] = float(cached)
             else:
-                uncached_pairs.append((query, doc500))
+                # Keep same rerank context length (500) => no quality reduction
+                uncached_pairs.append((query, c["doc"][:500]))
                 uncached_idx.append(i)
 
         if uncached_pairs:
-            new_scores = self.reranker.predict(uncached_pairs).tolist()
-            for idx, s in zip(uncached_idx, new_scores):
+            # Sort by doc length so each batch pads to similar lengths, then map back
+            order = sorted(range(len(uncached_pairs)), key=lambda j: len(uncached_pairs[j][1]))
+            with self._infer_sem:
+                new_scores = self.reranker.predict(
+                    [uncached_pairs[j] for j in order],
+                    batch_size=min(32, len(uncached_pairs)),
+                    show_progress_bar=False,
+                ).tolist()
+            for j, s in zip(order, new_scores):
+                idx = uncached_idx[j]
                 scores[idx] = float(s)
-                self._rerank_cache.set((query, doc500_list[idx]), float(s))
+                self._rerank_cache.set((query, candidates[idx]["id"]), float(s))
 
         for c, s in zip(candidates, scores):
             c["rerank_score"] = float(s if s is not None else 0.0)
 
-        candidates.sort(key=lambda x: x["rerank_score"], reverse=True)
-
         if exclude_do_not_cite:
             candidates = [c for c in candidates if not c["meta"].get("do_not_cite", False)]
+        if not candidates:
+            return []
 
-        return candidates[:n]
+        # Partial selection: a size-n heap instead of sorting every candidate.
+        # nlargest is defined as sorted(..., reverse=True)[:n], ties included.
+        return heapq.nlargest(n, candidates, key=lambda c: c["rerank_score"])
 
     # -----------------------------
     # Combined pipeline
     # -----------------------------
     def search(self, query: str, airline_filter: str | None = None) -> List[Dict[str, Any]]:
         candidates = self.retrieve(query, airline_filter=airline_filter)
-        return self.rerank(query, candidates)
\ No newline at end of file
+        if self._is_clear_winner(candidates):
+            # Dense order is already decisive: use cosine similarity as the score
+            for c in candidates:
+                c["rerank_score"] = 1.0 - c["distance"]
+            citable = [c for c in candidates if not c["meta"].get("do_not_cite", False)]
+            return citable[: settings.rerank_top_n]
+        return self.rerank(query, candidates)
+
+    def _is_clear_winner(self, candidates: List[Dict[str, Any]]) -> bool:
+        if self._skip_margin <= 0 or len(candidates) < 2:
+            return False
+        margin = candidates[1]["distance"] / max(candidates[0]["distance"], 1e-6)
+        return margin > self._skip_margin
\ No newline at end of file
@@ -7,7 +7,8 @@ Later you can swap extract_slots() with Ollama structured JSON.
 """
 
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Tuple
+from functools import lru_cache
 import re
 
 
@@ -25,158 +26,262 @@ def _norm(text: str) -> str:
     return (text or "").lower().strip()
 
 
-def _has_any(text: str, phrases: List[str]) -> bool:
-    return any(p in text for p in phrases)
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """
+    Regex source for a character trie of `phrases`: branches only diverge on
+    distinct next characters, so the engine never retries shared prefixes.
+    Optional tails are greedy, so a match is the longest phrase at that position.
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict[str, Any]) -> str:
+        alts = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ""
+        body = alts[0] if len(alts) == 1 else "(?:" + "|".join(alts) + ")"
+        if "" in node:
+            return (body if len(alts) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie)
+
+
+def _phrase_scanner(phrases: Iterable[str]) -> Callable[[str], FrozenSet[str]]:
+    """
+    Aho-Corasick-style multi-pattern scan: one trie regex walks the text in C
+    and returns every phrase that occurs as a substring (same result as
+    running `p in text` for each phrase).
+
+    Each search yields the longest phrase starting at the next matching
+    position; any shorter phrase matching there is a prefix of it, so every
+    hit expands to its precomputed prefix closure.
+    """
+    vocab = frozenset(phrases)
+    search = re.compile(_trie_pattern(vocab)).search
+    closure = {p: frozenset(q for q in vocab if p.startswith(q)) for p in vocab}
+
+    def scan(text: str) -> FrozenSet[str]:
+        found = set()
+        m = search(text)
+        while m is not None:
+            found.add(m.group())
+            m = search(text, m.start() + 1)
+        if not found:
+            return frozenset()
+        return frozenset().union(*(closure[p] for p in found))
+
+    return scan
 
 
 def detect_airline(text: str) -> str:
-    t = _norm(text)
+    return _detect_airline_norm(_norm(text))
+
+
+# All airline keywords in one precompiled alternation (word boundaries for
+# short codes like aa/dl/ua), so a single pass finds every mention. The
+# alternation sits in a zero-width lookahead so overlapping mentions
+# ("unitedelta") are all collected, matching the old per-keyword substring test.
+_AIRLINE_RE = re.compile(
+    "(?=("
+    + "|".join(rf"\b{re.escape(k)}\b" if len(k) <= 2 else re.escape(k) for k in AIRLINE_KEYWORDS)
+    + "))"
+)
+
+
+def _detect_airline_norm(t: str) -> str:
+    # `t` is already _norm()-ed
+    found = set(_AIRLINE_RE.findall(t))
+    if not found:
+        return ""
+    # AIRLINE_KEYWORDS order still decides priority when several airlines are mentioned
     for k, v in AIRLINE_KEYWORDS.items():
-        # word-boundary match for short codes like aa/dl/ua
-        if len(k) <= 2:
-            if re.search(rf"\b{k}\b", t):
-                return v
-        else:
-            if k in t:
-                return v
+        if k in found:
+            return v
     return ""
 
 
+# detect_case vocabulary as one trie regex: a single C-level search, stops at the first hit
+_CASE_BAGGAGE = ("baggage", "bag", "luggage", "suitcase", "checked bag", "lost bag", "delayed bag", "damaged bag")
+_CASE_BAGGAGE_RE = re.compile(_trie_pattern(_CASE_BAGGAGE))
+
+
 def detect_case(full_context: str) -> str:
     t = _norm(full_context)
 
-    baggage = ["baggage", "bag", "luggage", "suitcase", "checked bag", "lost bag", "delayed bag", "damaged bag"]
-    refund = ["refund", "cancel", "canceled", "cancelled", "rebook", "schedule change", "credit", "voucher"]
-
-    if _has_any(t, baggage):
+    # Refund vocabulary ("refund", "cancel", "voucher", ...) maps to the same
+    # answer as the default, so only the baggage scan decides the case.
+    if _CASE_BAGGAGE_RE.search(t):
         return "baggage"
-    if _has_any(t, refund):
-        return "refund"
     # default for demo
     return "refund"
 
 
+# ------------------------------------------------------------------
+# Keyword phrases for post_process_slots (plain substring semantics).
+# Module-level frozensets: built once, tested against the scan's hit set.
+# ------------------------------------------------------------------
+_YES_CANCEL = frozenset({
+    # Passive voice
+    "my flight was cancelled", "my flight was canceled",
+    "flight was cancelled", "flight was canceled",
+    "flight got cancelled", "flight got canceled",
+    # Active voice — airline as subject (covers "Delta cancelled my flight")
+    "cancelled my flight", "canceled my flight",
+    "cancelled the flight", "canceled the flight",
+    # Generic
+    "airline cancelled", "airline canceled",
+    "they cancelled", "they canceled",
+    "cancelled by", "canceled by",
+    "carrier cancelled", "carrier canceled",
+    # Refusing refund implies airline-initiated event
+    "refusing to refund", "refused my refund", "denying my refund",
+    "won't refund", "will not refund",
+})
+_NO_CANCEL = frozenset({
+    "i cancelled", "i canceled", "i want to cancel", "i plan to cancel",
+    "i'm cancelling", "i am cancelling", "i need to cancel",
+})
+_YES_SCHED = frozenset({
+    "schedule change", "changed my flight time", "changed my flight",
+    "time changed", "moved my flight", "rescheduled", "rerouted",
+    "changed the itinerary", "connection changed",
+})
+_NO_SCHED = frozenset({"no schedule change", "no change in schedule", "schedule unchanged"})
+_YES_WEATHER = frozenset({
+    "snow", "snowstorm", "storm", "hurricane", "cyclone", "typhoon",
+    "thunderstorm", "blizzard", "ice", "icy", "fog", "heavy rain", "weather",
+})
+_NO_WEATHER = frozenset({"not weather", "not due to weather", "weather is fine"})
+_YES_WAIVER = frozenset({"travel waiver", "waiver", "travel advisory", "travel alert", "weather waiver"})
+_NO_WAIVER = frozenset({"no waiver", "waiver not", "no travel waiver"})
+_YES_REFUNDABLE = frozenset({"refundable ticket", "fully refundable", "refundable fare"})
+_NO_REFUNDABLE = frozenset({"nonrefundable", "non-refundable", "basic economy", "no refund"})
+# --- NEW: escalation signals ---
+_REFUND_DENIED = frozenset({
+    "denied my refund", "refund denied", "refused refund", "refusing refund",
+    "won't refund", "will not refund", "not giving me a refund",
+})
+_CASH_REFUND_REFUSED = frozenset({
+    "only offering credit", "only credit", "only voucher", "only travel credit",
+    "refusing cash refund", "won't give cash", "will not give cash",
+    "no cash refund", "cash refund refused",
+})
+
+_BAG_DELAYED = frozenset({"baggage delayed", "bag delayed", "didn't arrive", "not arrived", "still not here", "missed bag"})
+_BAG_LOST = frozenset({"baggage lost", "bag lost", "never arrived", "missing bag", "lost luggage"})
+_BAG_DAMAGED = frozenset({
+    "baggage damaged", "bag damaged", "broken suitcase", "damaged luggage",
+    "wheel broke", "handle broke", "torn",
+})
+_YES_REPORT = frozenset({
+    "filed a report", "filed report", "filed a claim", "submitted a claim",
+    "reported it", "pir", "property irregularity report",
+})
+_NO_REPORT = frozenset({"haven't reported", "have not reported", "didn't report", "not reported yet"})
+
+
+_REFUND_SCAN = _phrase_scanner(
+    _YES_CANCEL | _NO_CANCEL | _YES_SCHED | _NO_SCHED | _YES_WEATHER | _NO_WEATHER
+    | _YES_WAIVER | _NO_WAIVER | _YES_REFUNDABLE | _NO_REFUNDABLE
+    | _REFUND_DENIED | _CASH_REFUND_REFUSED
+)
+_BAGGAGE_SCAN = _phrase_scanner(
+    _BAG_DELAYED | _BAG_LOST | _BAG_DAMAGED | _YES_REPORT | _NO_REPORT
+)
+
+
+# ------------------------------------------------------------------
+# Slot rules -> generated specialized functions
+# ------------------------------------------------------------------
+# Each rule: (slot, values that count as unset, branches). Branches are tried
+# in order as (value, phrases that must hit, phrases that must not hit).
+_UNSET = ("unknown",)
+
+_REFUND_RULES = (
+    # Airline cancelled?
+    ("airline_cancelled", _UNSET, (("yes", _YES_CANCEL, None), ("no", _NO_CANCEL, None))),
+    # Significant schedule change?
+    ("schedule_change", _UNSET, (("yes", _YES_SCHED, _NO_SCHED), ("no", _NO_SCHED, None))),
+    # Weather-related?
+    ("weather_related", _UNSET, (("yes", _YES_WEATHER, _NO_WEATHER), ("no", _NO_WEATHER, None))),
+    # Travel waiver active?
+    ("travel_waiver_active", _UNSET, (("yes", _YES_WAIVER, _NO_WAIVER), ("no", _NO_WAIVER, None))),
+    # Ticket refundable?
+    ("ticket_refundable", _UNSET, (("yes", _YES_REFUNDABLE, None), ("no", _NO_REFUNDABLE, None))),
+    # --- NEW: escalation signals ---
+    ("refund_denied", _UNSET, (("yes", _REFUND_DENIED, None),)),
+    ("cash_refund_refused", _UNSET, (("yes", _CASH_REFUND_REFUSED, None),)),
+)
+
+_BAGGAGE_RULES = (
+    # Precedence: lost > damaged > delayed
+    ("baggage_status", ("unknown", "", None), (
+        ("lost", _BAG_LOST, None), ("damaged", _BAG_DAMAGED, None), ("delayed", _BAG_DELAYED, None),
+    )),
+    ("baggage_report_filed", _UNSET, (("yes", _YES_REPORT, None), ("no", _NO_REPORT, None))),
+)
+
+
+def _compile_rules(name: str, rules: tuple) -> Callable[[FrozenSet[str], Dict[str, Any]], None]:
+    """
+    Partially evaluate a rule table into one straight-line function
+    `name(hits, out)`: slot names, values and phrase sets become constants,
+    so applying the rules is plain bytecode with no table walk per call.
+    """
+    consts: Dict[str, Any] = {}
+    lines = [f"def {name}(hits, out):"]
+    for slot, unset, branches in rules:
+        cond = f"out.get({slot!r}, 'unknown') " + (f"== {unset[0]!r}" if len(unset) == 1 else f"in {unset!r}")
+        lines.append(f"    if {cond}:")
+        for i, (value, must, must_not) in enumerate(branches):
+            must_name = f"_S{len(consts)}"
+            consts[must_name] = must
+            test = f"not hits.isdisjoint({must_name})"
+            if must_not is not None:
+                not_name = f"_S{len(consts)}"
+                consts[not_name] = must_not
+                test += f" and hits.isdisjoint({not_name})"
+            lines.append(f"        {'if' if i == 0 else 'elif'} {test}:")
+            lines.append(f"            out[{slot!r}] = {value!r}")
+    source = "\n".join(lines) + "\n"
+    exec(compile(source, f"<slots:{name}>", "exec"), consts)
+    return consts[name]
+
+
+_apply_refund_rules = _compile_rules("_apply_refund_rules", _REFUND_RULES)
+_apply_baggage_rules = _compile_rules("_apply_baggage_rules", _BAGGAGE_RULES)
+
+
 def post_process_slots(full_context: str, slots: Dict[str, Any], case: str) -> Dict[str, Any]:
     """
     Deterministic slot overrides from obvious keywords/phrases.
     Goal: reduce unnecessary clarifying questions for clear user statements.
+
+    The context is scanned once per call; the rule tables above are applied
+    to the resulting hit set by functions generated at import time.
     """
-    text = _norm(full_context)
+    return _post_process_norm(_norm(full_context), slots, case)
+
+
+def _post_process_norm(text: str, slots: Dict[str, Any], case: str) -> Dict[str, Any]:
+    # `text` is already _norm()-ed
     out = dict(slots or {})
 
-    # -------------------------
-    # Refund / disruption slots
-    # -------------------------
     if case == "refund":
-        # Airline cancelled?
-        if out.get("airline_cancelled", "unknown") == "unknown":
-            yes_cancel = [
-                # Passive voice
-                "my flight was cancelled", "my flight was canceled",
-                "flight was cancelled", "flight was canceled",
-                "flight got cancelled", "flight got canceled",
-                # Active voice — airline as subject (covers "Delta cancelled my flight")
-                "cancelled my flight", "canceled my flight",
-                "cancelled the flight", "canceled the flight",
-                # Generic
-                "airline cancelled", "airline canceled",
-                "they cancelled", "they canceled",
-                "cancelled by", "canceled by",
-                "carrier cancelled", "carrier canceled",
-                # Refusing refund implies airline-initiated event
-                "refusing to refund", "refused my refund", "denying my refund",
-                "won't refund", "will not refund",
-            ]
-            no_cancel = [
-                "i cancelled", "i canceled", "i want to cancel", "i plan to cancel",
-                "i'm cancelling", "i am cancelling", "i need to cancel",
-            ]
-            if _has_any(text, yes_cancel):
-                out["airline_cancelled"] = "yes"
-            elif _has_any(text, no_cancel):
-                out["airline_cancelled"] = "no"
-
-        # Significant schedule change?
-        if out.get("schedule_change", "unknown") == "unknown":
-            yes_sched = [
-                "schedule change", "changed my flight time", "changed my flight",
-                "time changed", "moved my flight", "rescheduled", "rerouted",
-                "changed the itinerary", "connection changed",
-            ]
-            no_sched = ["no schedule change", "no change in schedule", "schedule unchanged"]
-            if _has_any(text, yes_sched) and not _has_any(text, no_sched):
-                out["schedule_change"] = "yes"
-            elif _has_any(text, no_sched):
-                out["schedule_change"] = "no"
-
-        # Weather-related?
-        if out.get("weather_related", "unknown") == "unknown":
-            yes_weather = [
-                "snow", "snowstorm", "storm", "hurricane", "cyclone", "typhoon",
-                "thunderstorm", "blizzard", "ice", "icy", "fog", "heavy rain", "weather",
-            ]
-            no_weather = ["not weather", "not due to weather", "weather is fine"]
-            if _has_any(text, yes_weather) and not _has_any(text, no_weather):
-                out["weather_related"] = "yes"
-            elif _has_any(text, no_weather):
-                out["weather_related"] = "no"
-
-        # Travel waiver active?
-        if out.get("travel_waiver_active", "unknown") == "unknown":
-            yes_waiver = ["travel waiver", "waiver", "travel advisory", "travel alert", "weather waiver"]
-            no_waiver = ["no waiver", "waiver not", "no travel waiver"]
-            if _has_any(text, yes_waiver) and not _has_any(text, no_waiver):
-                out["travel_waiver_active"] = "yes"
-            elif _has_any(text, no_waiver):
-                out["travel_waiver_active"] = "no"
-
-        # Ticket refundable?
-        if out.get("ticket_refundable", "unknown") == "unknown":
-            yes_ref = ["refundable ticket", "fully refundable", "refundable fare"]
-            no_ref = ["nonrefundable", "non-refundable", "basic economy", "no refund"]
-            if _has_any(text, yes_ref):
-                out["ticket_refundable"] = "yes"
-            elif _has_any(text, no_ref):
-                out["ticket_refundable"] = "no"
-
-        # --- NEW: escalation signals ---
-        if out.get("refund_denied", "unknown") == "unknown":
-            if _has_any(text, [
-                "denied my refund", "refund denied", "refused refund", "refusing refund",
-                "won't refund", "will not refund", "not giving me a refund",
-            ]):
-                out["refund_denied"] = "yes"
-
-        if out.get("cash_refund_refused", "unknown") == "unknown":
-            if _has_any(text, [
-                "only offering credit", "only credit", "only voucher", "only travel credit",
-                "refusing cash refund", "won't give cash", "will not give cash",
-                "no cash refund", "cash refund refused",
-            ]):
-                out["cash_refund_refused"] = "yes"
-
-    # -------------------------
-    # Baggage slots
-    # -------------------------
-    if case == "baggage":
-        if out.get("baggage_status", "unknown") in ("unknown", "", None):
-            delayed = ["baggage delayed", "bag delayed", "didn't arrive", "not arrived", "still not here", "missed bag"]
-            lost = ["baggage lost", "bag lost", "never arrived", "missing bag", "lost luggage"]
-            damaged = ["baggage damaged", "bag damaged", "broken suitcase", "damaged luggage", "wheel broke", "handle broke", "torn"]
-            if _has_any(text, lost):
-                out["baggage_status"] = "lost"
-            elif _has_any(text, damaged):
-                out["baggage_status"] = "damaged"
-            elif _has_any(text, delayed):
-                out["baggage_status"] = "delayed"
-
-        if out.get("baggage_report_filed", "unknown") == "unknown":
-            yes_report = ["filed a report", "filed report", "filed a claim", "submitted a claim", "reported it", "pir", "property irregularity report"]
-            no_report = ["haven't reported", "have not reported", "didn't report", "not reported yet"]
-            if _has_any(text, yes_report):
-                out["baggage_report_filed"] = "yes"
-            elif _has_any(text, no_report):
-                out["baggage_report_filed"] = "no"
+        hits = _REFUND_SCAN(text)
+        # No refund vocabulary (greetings, meta turns): nothing to override
+        if hits:
+            _apply_refund_rules(hits, out)
+
+    elif case == "baggage":
+        hits = _BAGGAGE_SCAN(text)
+        if hits:
+            _apply_baggage_rules(hits, out)
 
     return out
 
@@ -184,8 +289,22 @@ def post_process_slots(full_context: str, slots: Dict[str, Any], case: str) -> D
 def extract_slots(full_context: str, case: str) -> Dict[str, Any]:
     """
     Basic rule-based slot extraction.
+    Repeated contexts (retries, re-sent turns) are served from an LRU cache;
+    callers always get a fresh dict they are free to mutate.
     """
-    airline = detect_airline(full_context)
+    return dict(_extract_slots_cached(full_context, case))
+
+
+@lru_cache(maxsize=256)
+def _extract_slots_cached(full_context: str, case: str) -> Tuple[Tuple[str, Any], ...]:
+    # Slot values are plain strings, so an items tuple is a safe immutable cache entry
+    return tuple(_extract_slots(full_context, case).items())
+
+
+def _extract_slots(full_context: str, case: str) -> Dict[str, Any]:
+    # Normalize once and hand the lowered text to every helper
+    text = _norm(full_context)
+    airline = _detect_airline_norm(text)
 
     if case == "refund":
         slots = {
@@ -200,7 +319,7 @@ def extract_slots(full_context: str, case: str) -> Dict[str, Any]:
             "refund_denied": "unknown",
             "cash_refund_refused": "unknown",
         }
-        return post_process_slots(full_context, slots, case)
+        return _post_process_norm(text, slots, case)
 
     if case == "baggage":
         slots = {
@@ -210,7 +329,7 @@ def extract_slots(full_context: str, case: str) -> Dict[str, Any]:
             "baggage_report_filed": "unknown",
             "bag_fee_refund": "unknown",
         }
-        return post_process_slots(full_context, slots, case)
+        return _post_process_norm(text, slots, case)
 
     return {"case": case, "airline": airline}
 
@@ -248,30 +367,37 @@ def clarifying_question(case: str, missing: List[str], slots: Dict[str, Any] | N
     return "Can you share a bit more detail so I can check the right policy?"
 
 
+# Query enrichment tables: fixed tokens per case, then (slot, value) -> extra
+# tokens for refunds. Dict order is the order tokens are appended to the query.
+_QUERY_BASE_TOKENS = {
+    "refund": ("refund", "cancellation", "refund policy"),
+    "baggage": ("baggage", "lost", "delayed", "damaged", "compensation", "claim"),
+}
+_REFUND_QUERY_TOKENS = {
+    ("airline_cancelled", "yes"): ("airline cancelled", "involuntary cancellation", "cash refund"),
+    ("airline_cancelled", "no"): ("voluntary cancellation", "travel credit", "non-refundable"),
+    ("schedule_change", "yes"): ("significant schedule change", "delay", "reroute"),
+    ("weather_related", "yes"): ("weather", "travel waiver"),
+}
+
+
 def build_retrieval_query(user_msg: str, slots: Dict[str, Any]) -> str:
     """
     Build enriched retrieval query using known slots.
     """
-    airline = (slots.get("airline") or "").strip()
     case = slots.get("case") or "refund"
+    base = _QUERY_BASE_TOKENS.get(case)
+    if base is None:
+        return (user_msg or "").strip()
 
-    parts = [user_msg]
-
+    airline = (slots.get("airline") or "").strip()
+    parts = [user_msg, *base, airline]
     if case == "refund":
-        parts += ["refund", "cancellation", "refund policy"]
-        if airline:
-            parts.append(airline)
-        if slots.get("airline_cancelled") == "yes":
-            parts += ["airline cancelled", "involuntary cancellation", "cash refund"]
-        if slots.get("airline_cancelled") == "no":
-            parts += ["voluntary cancellation", "travel credit", "non-refundable"]
-        if slots.get("schedule_change") == "yes":
-            parts += ["significant schedule change", "delay", "reroute"]
-        if slots.get("weather_related") == "yes":
-            parts += ["weather", "travel waiver"]
-    elif case == "baggage":
-        parts += ["baggage", "lost", "delayed", "damaged", "compensation", "claim"]
-        if airline:
-            parts.append(airline)
-
-    return " ".join([p for p in parts if p]).strip()
\ No newline at end of file
+        parts.extend(
+            tok
+            for (slot, value), toks in _REFUND_QUERY_TOKENS.items()
+            if slots.get(slot) == value
+            for tok in toks
+        )
+
+    return " ".join([p for p in parts if p]).strip()
@@ -8,15 +8,40 @@ Usage:
     python diagnose_performance.py
 """
 
+import io
 import time
 import sys
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 # Add project root to path
 PROJECT_ROOT = Path(__file__).parent
 sys.path.insert(0, str(PROJECT_ROOT))
 
+# One keep-alive session shared by every HTTP probe (lazy: requests is imported on first use)
+_SESSION = None
+
+def _get_session():
+    global _SESSION
+    if _SESSION is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        _SESSION = requests.Session()
+        _SESSION.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=4))
+    return _SESSION
+
+# Embedder shared by the model-loading and ChromaDB probes (loaded once, ~400MB)
+_EMBEDDER = None
+
+def _get_embedder():
+    global _EMBEDDER
+    if _EMBEDDER is None:
+        from sentence_transformers import SentenceTransformer
+        _EMBEDDER = SentenceTransformer("intfloat/e5-base-v2")
+    return _EMBEDDER
+
 def print_header(text):
     print(f"\n{'='*60}")
     print(f"  {text}")
@@ -32,7 +57,7 @@ def test_ollama_connection():
         # Test connection
         print("Testing /api/tags endpoint...")
         start = time.time()
-        r = requests.get("http://localhost:11434/api/tags", timeout=5)
+        r = _get_session().get("http://localhost:11434/api/tags", timeout=5)
         elapsed = time.time() - start
         
         if r.status_code == 200:
@@ -53,8 +78,16 @@ def test_ollama_connection():
         print(f"❌ Error: {e}")
         return False
     
-    # Test generation speed
-    print("\nTesting generation speed...")
+    return True
+
+
+def test_ollama_generation():
+    """Test Ollama generation speed (local inference: run alone, not alongside other probes)."""
+    print_header("2️⃣  Testing Ollama Generation")
+    
+    import requests
+    
+    print("Testing generation speed...")
     try:
         start = time.time()
         payload = {
@@ -63,7 +96,7 @@ def test_ollama_connection():
             "stream": False,
             "keep_alive": "10m"
         }
-        r = requests.post("http://localhost:11434/api/generate", json=payload, timeout=30)
+        r = _get_session().post("http://localhost:11434/api/generate", json=payload, timeout=30)
         elapsed = time.time() - start
         
         if r.status_code == 200:
@@ -94,14 +127,13 @@ def test_ollama_connection():
 
 def test_model_loading():
     """Test sentence-transformers and cross-encoder loading times."""
-    print_header("2️⃣  Testing Model Loading Times")
+    print_header("3️⃣  Testing Model Loading Times")
     
     try:
         # Test embedder
         print("Loading sentence-transformers embedder...")
         start = time.time()
-        from sentence_transformers import SentenceTransformer
-        embedder = SentenceTransformer("intfloat/e5-base-v2")
+        embedder = _get_embedder()
         elapsed = time.time() - start
         print(f"✅ Embedder loaded ({elapsed:.2f}s)")
         
@@ -110,15 +142,17 @@ def test_model_loading():
             print("   First load is expected to be slow (downloading)")
             print("   Subsequent loads should be <5s")
         
-        # Test embedding
-        print("\nTesting embedding speed...")
+        # Test embedding (batched: measures throughput, not single-call overhead)
+        print("\nTesting embedding throughput...")
+        n = 32
         start = time.time()
-        emb = embedder.encode(["test query"], normalize_embeddings=True)
+        emb = embedder.encode(["test query"] * n, batch_size=n, normalize_embeddings=True)
         elapsed = time.time() - start
-        print(f"✅ Embedding generated ({elapsed:.3f}s)")
+        print(f"✅ Embedded {n} queries ({elapsed:.3f}s)")
+        print(f"   {elapsed / n * 1000:.1f} ms/item, {n / elapsed:.1f} items/s")
         
-        if elapsed > 1:
-            print("⚠️  Warning: Embedding is slow (>1s)")
+        if elapsed / n > 0.1:
+            print("⚠️  Warning: Embedding is slow (>100ms per item)")
         
     except Exception as e:
         print(f"❌ Error loading embedder: {e}")
@@ -136,16 +170,18 @@ def test_model_loading():
         if elapsed > 30:
             print("⚠️  Warning: Reranker loading is slow (>30s)")
         
-        # Test reranking
-        print("\nTesting reranking speed...")
+        # Test reranking (batched, like scoring the retrieved top-k)
+        print("\nTesting reranking throughput...")
+        n_pairs = 64
         start = time.time()
-        pairs = [("query", "document text here")] * 10
-        scores = reranker.predict(pairs)
+        pairs = [("query", "document text here")] * n_pairs
+        scores = reranker.predict(pairs, batch_size=32)
         elapsed = time.time() - start
-        print(f"✅ Reranking complete ({elapsed:.3f}s for 10 pairs)")
+        print(f"✅ Reranking complete ({elapsed:.3f}s for {n_pairs} pairs)")
+        print(f"   {n_pairs / elapsed:.1f} pairs/s")
         
-        if elapsed > 2:
-            print("⚠️  Warning: Reranking is slow (>2s for 10 pairs)")
+        if n_pairs / elapsed < 5:
+            print("⚠️  Warning: Reranking is slow (<5 pairs/s)")
         
     except Exception as e:
         print(f"❌ Error loading reranker: {e}")
@@ -156,7 +192,7 @@ def test_model_loading():
 
 def test_chromadb():
     """Test ChromaDB access and query speed."""
-    print_header("3️⃣  Testing ChromaDB")
+    print_header("4️⃣  Testing ChromaDB")
     
     try:
         import chromadb
@@ -180,8 +216,7 @@ def test_chromadb():
         
         # Test query speed
         print("\nTesting query speed...")
-        from sentence_transformers import SentenceTransformer
-        embedder = SentenceTransformer("intfloat/e5-base-v2")
+        embedder = _get_embedder()
         
         start = time.time()
         query_emb = embedder.encode(["refund policy"], normalize_embeddings=True).tolist()[0]
@@ -207,14 +242,14 @@ def test_chromadb():
 
 def test_backend_startup():
     """Test if backend can start and respond."""
-    print_header("4️⃣  Testing Backend Startup")
+    print_header("5️⃣  Testing Backend Startup")
     
     try:
         import requests
         
         print("Testing /health endpoint...")
         try:
-            r = requests.get("http://localhost:8000/health", timeout=3)
+            r = _get_session().get("http://localhost:8000/health", timeout=3)
             
             if r.status_code == 200:
                 data = r.json()
@@ -236,9 +271,60 @@ def test_backend_startup():
     return True
 
 
+class _ProbeStdout(io.TextIOBase):
+    """sys.stdout proxy: a thread with a buffer set writes there, others pass through."""
+
+    def __init__(self, real):
+        self._real = real
+        self._local = threading.local()
+
+    def write(self, text):
+        buf = getattr(self._local, "buf", None)
+        return (buf if buf is not None else self._real).write(text)
+
+    def flush(self):
+        self._real.flush()
+
+
+def run_probes_concurrently(probes):
+    """
+    Run network-bound probes in parallel (their HTTP waits overlap) while each
+    probe's output is buffered and printed as one block when it finishes.
+    """
+    real_stdout = sys.stdout
+    proxy = _ProbeStdout(real_stdout)
+    print_lock = threading.Lock()
+
+    def run(fn):
+        proxy._local.buf = io.StringIO()
+        try:
+            ok = fn()
+        except Exception as e:
+            print(f"❌ Error: {e}")
+            ok = False
+        finally:
+            output = proxy._local.buf.getvalue()
+            proxy._local.buf = None
+        with print_lock:
+            real_stdout.write(output)
+            real_stdout.flush()
+        return ok
+
+    sys.stdout = proxy
+    try:
+        with ThreadPoolExecutor(max_workers=len(probes)) as ex:
+            futures = {ex.submit(run, fn): name for name, fn in probes.items()}
+            done = {futures[f]: f.result() for f in as_completed(futures)}
+    finally:
+        sys.stdout = real_stdout
+
+    # Summary keeps the declared probe order regardless of completion order
+    return {name: done[name] for name in probes}
+
+
 def check_system_resources():
     """Check CPU, memory, disk usage."""
-    print_header("5️⃣  System Resources")
+    print_header("6️⃣  System Resources")
     
     try:
         import psutil
@@ -271,11 +357,18 @@ def main():
     print("\n🔬 RAG-Airline-Assistant Performance Diagnostics")
     print("=" * 60)
     
+    # Only the network-bound checks overlap. Generation, model loading and the
+    # vector store are CPU-heavy, so they run one at a time: run together they
+    # would skew each other's timings.
+    reachable = run_probes_concurrently({
+        "ollama": test_ollama_connection,
+        "backend": test_backend_startup,
+    })
     results = {
-        "ollama": test_ollama_connection(),
+        "ollama": reachable["ollama"] and test_ollama_generation(),
         "models": test_model_loading(),
         "chromadb": test_chromadb(),
-        "backend": test_backend_startup(),
+        "backend": reachable["backend"],
     }
     
     check_system_resources()
@@ -1,4 +1,5 @@
 import sys
+from collections import Counter
 from pathlib import Path
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
@@ -7,6 +8,14 @@ sys.path.insert(0, str(PROJECT_ROOT))
 import chromadb
 from chromadb.config import Settings
 
+PAGE_SIZE = 1000
+
+
+def iter_metadatas(col, count):
+    """Page through every row's metadata only (no documents or embeddings)."""
+    for offset in range(0, count, PAGE_SIZE):
+        yield from col.get(limit=PAGE_SIZE, offset=offset, include=["metadatas"])["metadatas"]
+
 # Added error handling
 try:
     client = chromadb.PersistentClient(
@@ -28,8 +37,8 @@ try:
         print(f"{'='*60}\n")
         sys.exit(1)
 
-    # Peek at first 3 chunks
-    results = col.peek(limit=min(3, count))
+    # First 3 chunks: fetch only the fields shown (peek() also pulls embeddings)
+    results = col.get(limit=min(3, count), include=["documents", "metadatas"])
     print(f"\n📄 Sample chunks:\n")
     print(f"{'-'*60}\n")
     
@@ -59,12 +68,11 @@ try:
     # Validation checks
     print("🔍 Validation Checks:\n")
     
-    # Check 1: Airline normalization
-    all_airlines = set()
-    for meta in results["metadatas"]:
-        all_airlines.add(meta.get('airline', ''))
+    # Check 1: Airline normalization (whole store, metadata-only pages)
+    all_airlines = {meta.get('airline', '') for meta in iter_metadatas(col, count)}
     
-    non_normalized = [a for a in all_airlines if a and not (a.islower() or a in ("DOT", "INTERNAL"))]
+    # Dedupe first, then one set difference; only the few distinct values get the islower() test
+    non_normalized = sorted(a for a in all_airlines - {"", "DOT", "INTERNAL"} if not a.islower())
     if non_normalized:
         print(f"  ⚠️  WARNING: Found non-lowercase airlines: {non_normalized}")
         print(f"     This will break filtering! Re-ingest with fixed script.")
@@ -76,10 +84,7 @@ try:
     print(f"  ✅ Citable chunks: {citable_count}/{len(results['metadatas'])} in sample")
     
     # Check 3: Authority distribution
-    authorities = {}
-    for meta in results["metadatas"]:
-        auth = meta.get('authority', 'unknown')
-        authorities[auth] = authorities.get(auth, 0) + 1
+    authorities = Counter(meta.get('authority', 'unknown') for meta in results["metadatas"])
     
     print(f"  ℹ️  Authority breakdown in sample:")
     for auth, cnt in sorted(authorities.items()):
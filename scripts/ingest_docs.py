@@ -1,10 +1,14 @@
+import hashlib
 import os
 import re
-import uuid
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import chromadb
+import numpy as np
 from chromadb.config import Settings
 from sentence_transformers import SentenceTransformer
 
@@ -12,6 +16,12 @@ from sentence_transformers import SentenceTransformer
 # ----------------------------
 # Chunking (SECTION-aware)
 # ----------------------------
+_RE_BLANKS = re.compile(r"\n{3,}")
+_RE_SECTION_SPLIT = re.compile(r"\n(?=SECTION:)")
+_RE_CONTENT_START = re.compile(r"^[^\S\n]*(?:SECTION:|$)", re.MULTILINE)
+_RE_OTHER_LINE_BREAKS = re.compile("[\r\v\f\x1c\x1d\x1e\x85\u2028\u2029]")
+
+
 def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]:
     """
     SECTION-aware chunking:
@@ -19,20 +29,29 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
     - Keeps SECTION blocks together when possible.
     - Falls back to sentence-ish splitting for long sections.
     """
-    text = re.sub(r"\n{3,}", "\n\n", text).strip()
-
-    # FIXED: Strip front-matter before chunking (same as backend)
-    lines = text.splitlines()
-    content_start = 0
-    for i, line in enumerate(lines):
-        if line.strip() == "" or line.strip().startswith("SECTION:"):
-            content_start = i
-            break
-    text = "\n".join(lines[content_start:]).strip()
+    text = _RE_BLANKS.sub("\n\n", text).strip()
+
+    # FIXED: Strip front-matter before chunking (same as backend). Content
+    # starts at the first blank line OR first SECTION: line, found with one
+    # regex scan and kept as a single slice.
+    # Line breaks other than "\n" (which the old splitlines/join rewrote to
+    # "\n") are rare; those files keep the line-based path.
+    if _RE_OTHER_LINE_BREAKS.search(text):
+        lines = text.splitlines()
+        content_start = 0
+        for i, line in enumerate(lines):
+            if line.strip() == "" or line.strip().startswith("SECTION:"):
+                content_start = i
+                break
+        text = "\n".join(lines[content_start:]).strip()
+    else:
+        m = _RE_CONTENT_START.search(text)
+        if m:
+            text = text[m.start():].strip()
 
     # Split into sections by "SECTION:" markers if present
     # Otherwise treat whole document as one section
-    sections = re.split(r"\n(?=SECTION:)", text) if "SECTION:" in text else [text]
+    sections = _RE_SECTION_SPLIT.split(text) if "SECTION:" in text else [text]
 
     chunks: List[str] = []
     for section in sections:
@@ -67,6 +86,18 @@ def chunk_text(text: str, max_chars: int = 900, overlap: int = 150) -> List[str]
 # ----------------------------
 # Metadata parsing
 # ----------------------------
+def _head_lines(text: str, limit: int) -> Iterator[str]:
+    """Yield up to `limit` lines from the top of text without splitting the rest."""
+    start = 0
+    for _ in range(limit):
+        end = text.find("\n", start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
 def parse_front_matter(text: str) -> Dict[str, str]:
     """
     Reads KEY: VALUE lines near the top of snapshot files.
@@ -79,7 +110,11 @@ def parse_front_matter(text: str) -> Dict[str, str]:
       DO_NOT_CITE: TRUE
     """
     meta: Dict[str, str] = {}
-    for line in text.splitlines()[:40]:
+    # Front matter ends at the first blank line (the same boundary chunk_text
+    # strips), so body lines that happen to contain ":" are never read as keys
+    for line in _head_lines(text, 40):
+        if not line.strip():
+            break
         if ":" not in line:
             continue
         k, v = line.split(":", 1)
@@ -117,9 +152,196 @@ def normalize_bool(val: str) -> bool:
     return str(val).strip().lower() in {"true", "yes", "1"}
 
 
+def chunk_id_hash(source_file: str, chunk_index: int, chunk: str) -> str:
+    """Stable 16-hex-char id suffix (same scheme as backend/ingestion.py)."""
+    h = hashlib.blake2b(digest_size=8)
+    h.update(source_file.encode("utf-8"))
+    h.update(chunk_index.to_bytes(4, "little"))
+    h.update(chunk.encode("utf-8"))
+    return h.hexdigest()
+
+
 # ----------------------------
 # Ingestion
 # ----------------------------
+READ_WORKERS = 16
+
+# Ingest SQLite settings. chroma.sqlite3 also holds Chroma's system tables and
+# any other collections, so durability must survive a crash mid-ingest: WAL with
+# synchronous=NORMAL never corrupts the file (at worst the last commits are
+# lost) while dropping the fsync on every commit that the default
+# rollback journal + FULL pays. No exclusive lock, so a running backend can
+# keep reading the store.
+_INGEST_PRAGMAS = ("journal_mode=WAL", "synchronous=NORMAL", "temp_store=MEMORY")
+
+
+def _tune_sqlite(client) -> None:
+    """Best-effort: apply _INGEST_PRAGMAS to this thread's Chroma SQLite connection."""
+    try:
+        from chromadb.db.impl.sqlite import SqliteDB
+
+        conn = client._system.instance(SqliteDB)._conn_pool.connect()
+        for pragma in _INGEST_PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+    except Exception as e:
+        # Private Chroma internals; if they move, ingest still works (just slower)
+        print(f"⚠️  SQLite pragmas not applied: {type(e).__name__}: {e}", flush=True)
+
+
+def _load_and_chunk(
+    file_path: Path, policies_root: Path, max_chars: int, overlap: int
+) -> Optional[Tuple[Path, Dict[str, object], List[str]]]:
+    """Read, parse and chunk one file (runs on a reader thread)."""
+    raw = file_path.read_text(encoding="utf-8", errors="ignore").strip()
+    if not raw:
+        return None
+
+    front = parse_front_matter(raw)
+    path_md = infer_path_metadata(file_path, policies_root)
+
+    # Merge metadata (front-matter overrides path inference)
+    do_not_cite = normalize_bool(front.get("do_not_cite", "")) or bool(path_md.get("do_not_cite", False))
+
+    # FIXED: Normalize airline to lowercase for case-insensitive filtering
+    airline_raw = front.get("airline") or str(path_md.get("airline") or "")
+    airline_normalized = airline_raw.strip().lower()
+
+    metadata_base = {
+        "source_file": str(file_path).replace("\\", "/"),
+        "source": front.get("source") or "",
+        "url": front.get("url") or "",
+        "captured_on": front.get("captured_on") or "",
+        "authority": front.get("authority") or str(path_md.get("authority") or ""),
+        "airline": airline_normalized,  # FIXED: was not normalized
+        "domain": front.get("domain") or str(path_md.get("domain") or ""),
+        "do_not_cite": do_not_cite,
+    }
+
+    chunks = chunk_text(raw, max_chars=max_chars, overlap=overlap)
+    if not chunks:
+        return None
+    return file_path, metadata_base, chunks
+
+
+# ----------------------------
+# Embedding cache (content-hash keyed)
+# ----------------------------
+EMBED_CACHE_NAME = "embed_cache.sqlite3"
+EMBED_BATCH_SIZE = 32  # sentence-transformers default
+EMBED_BATCH_SIZE_GPU = 128  # fp16 activations leave room for bigger batches
+ENCODE_WINDOW = 2000  # chunks per encode call, pooled across files (a multiple of UPSERT_BATCH_SIZE)
+UPSERT_BATCH_SIZE = 500  # rows per Chroma upsert (capped at client.get_max_batch_size())
+
+
+def _open_embed_cache(persist_dir: str) -> sqlite3.Connection:
+    """
+    Passage embeddings keyed by (model, blake2b(passage)). Lives next to the
+    Chroma files but outside the collection, so it survives the rebuild below:
+    unchanged chunks skip the transformer on every re-ingest.
+
+    Vectors are stored as raw float16 bytes (half the size of float32, far
+    smaller than JSON/lists); hits are widened and re-normalized on read.
+    """
+    conn = sqlite3.connect(os.path.join(persist_dir, EMBED_CACHE_NAME))
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS embeddings_f16 ("
+        "model TEXT NOT NULL, key TEXT NOT NULL, vec BLOB NOT NULL, PRIMARY KEY (model, key))"
+    )
+    return conn
+
+
+def _load_embedder(embed_model: str) -> Tuple[SentenceTransformer, str]:
+    """CUDA with fp16 weights when available (tensor-core GEMMs, half the memory), else CPU."""
+    try:
+        import torch
+
+        if torch.cuda.is_available():
+            model = SentenceTransformer(embed_model, device="cuda", model_kwargs={"torch_dtype": torch.float16})
+            return model, "cuda"
+    except Exception:
+        pass
+    return SentenceTransformer(embed_model, device="cpu"), "cpu"
+
+
+def _encode(embedder: SentenceTransformer, device: str, passages: List[str]) -> np.ndarray:
+    """Normalized float32 passage embeddings."""
+    if device == "cpu":
+        return np.asarray(
+            embedder.encode(passages, batch_size=EMBED_BATCH_SIZE, normalize_embeddings=True, convert_to_numpy=True),
+            dtype=np.float32,
+        )
+    # fp16 model: widen to float32 first, then normalize, so stored vectors are unit length
+    emb = np.asarray(
+        embedder.encode(passages, batch_size=EMBED_BATCH_SIZE_GPU, convert_to_numpy=True),
+        dtype=np.float32,
+    )
+    emb /= np.maximum(np.linalg.norm(emb, axis=1, keepdims=True), 1e-12)
+    return emb
+
+
+def _encode_cached(
+    embedder: SentenceTransformer, device: str, cache: sqlite3.Connection, model: str, passages: List[str]
+) -> np.ndarray:
+    """Encode only passages missing from the cache; returns normalized float32 rows."""
+    keys = [hashlib.blake2b(p.encode("utf-8"), digest_size=16).hexdigest() for p in passages]
+    hits: Dict[str, bytes] = {}
+    unique = list(dict.fromkeys(keys))
+    for start in range(0, len(unique), 500):  # stay under SQLite's bound-parameter limit
+        part = unique[start:start + 500]
+        rows = cache.execute(
+            f"SELECT key, vec FROM embeddings_f16 WHERE model = ? AND key IN ({','.join('?' * len(part))})",
+            [model, *part],
+        )
+        hits.update(rows)
+
+    vecs: List[np.ndarray] = [None] * len(passages)  # type: ignore[list-item]
+    for i, key in enumerate(keys):
+        if key in hits:
+            # fp16 rounding moves the norm slightly off 1; restore it for cosine
+            vec = np.frombuffer(hits[key], dtype=np.float16).astype(np.float32)
+            vecs[i] = vec / np.linalg.norm(vec)
+
+    miss = [i for i, v in enumerate(vecs) if v is None]
+    if miss:
+        fresh = _encode(embedder, device, [passages[i] for i in miss])
+        for row, i in zip(fresh, miss):
+            vecs[i] = row
+        with cache:
+            cache.executemany(
+                "INSERT OR REPLACE INTO embeddings_f16 (model, key, vec) VALUES (?, ?, ?)",
+                [(model, keys[i], row.astype(np.float16).tobytes()) for row, i in zip(fresh, miss)],
+            )
+
+    return np.vstack(vecs)
+
+
+def _flush_window(
+    collection,
+    embedder: SentenceTransformer,
+    device: str,
+    cache: sqlite3.Connection,
+    model: str,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, object]],
+    upsert_batch: int,
+) -> None:
+    """Embed one cross-file window of chunks in a single encode call, then write it in batches."""
+    # e5 requires prefixes for best retrieval quality
+    passages = [f"passage: {d}" for d in documents]
+    # Keep a float32 ndarray: Chroma accepts it directly, so no list of
+    # boxed Python floats is built (the old .tolist() round-trip)
+    embeddings = _encode_cached(embedder, device, cache, model, passages)
+    for start in range(0, len(ids), upsert_batch):
+        end = start + upsert_batch
+        collection.upsert(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=metadatas[start:end],
+        )
+
+
 def ingest_policies(
     policies_dir: str = "data/policies",
     persist_dir: str = "vector_store",
@@ -138,6 +360,7 @@ def ingest_policies(
         path=persist_dir,
         settings=Settings(anonymized_telemetry=False),
     )
+    _tune_sqlite(client)
 
     # FIXED: Delete and recreate collection for clean re-ingest
     try:
@@ -150,70 +373,53 @@ def ingest_policies(
         metadata={"hnsw:space": "cosine"},
     )
 
-    embedder = SentenceTransformer(embed_model)
+    embedder, device = _load_embedder(embed_model)
+    embed_cache = _open_embed_cache(persist_dir)
 
     files_ingested = 0
     chunks_ingested = 0
 
-    # Recursively read .txt files (sorted for consistent order)
-    for file_path in sorted(policies_root.rglob("*.txt")):
-        raw = file_path.read_text(encoding="utf-8", errors="ignore").strip()
-        if not raw:
-            continue
-
-        front = parse_front_matter(raw)
-        path_md = infer_path_metadata(file_path, policies_root)
-
-        # Merge metadata (front-matter overrides path inference)
-        do_not_cite = normalize_bool(front.get("do_not_cite", "")) or bool(path_md.get("do_not_cite", False))
-
-        # FIXED: Normalize airline to lowercase for case-insensitive filtering
-        airline_raw = front.get("airline") or str(path_md.get("airline") or "")
-        airline_normalized = airline_raw.strip().lower()
-
-        metadata_base = {
-            "source_file": str(file_path).replace("\\", "/"),
-            "source": front.get("source") or "",
-            "url": front.get("url") or "",
-            "captured_on": front.get("captured_on") or "",
-            "authority": front.get("authority") or str(path_md.get("authority") or ""),
-            "airline": airline_normalized,  # FIXED: was not normalized
-            "domain": front.get("domain") or str(path_md.get("domain") or ""),
-            "do_not_cite": do_not_cite,
-        }
-
-        chunks = chunk_text(raw, max_chars=max_chars, overlap=overlap)
-        if not chunks:
-            continue
-
-        # e5 requires prefixes for best retrieval quality
-        passages = [f"passage: {c}" for c in chunks]
-        embeddings = embedder.encode(passages, normalize_embeddings=True).tolist()
-
-        ids = []
-        metadatas = []
-        documents = []
-
-        for i, (chunk, emb) in enumerate(zip(chunks, embeddings)):
-            chunk_id = f"{file_path.stem}__{i}__{uuid.uuid4().hex[:8]}"
-            ids.append(chunk_id)
-
-            md = dict(metadata_base)
-            md["chunk_index"] = i
-            metadatas.append(md)
-
-            documents.append(chunk)
-
-        collection.add(
-            ids=ids,
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
-        )
-
-        files_ingested += 1
-        chunks_ingested += len(chunks)
-
+    # Chunks from many small files are pooled into one window so each encode
+    # call fills whole transformer batches instead of one short call per file,
+    # and written in fixed-size upserts instead of one per file.
+    upsert_batch = max(1, min(UPSERT_BATCH_SIZE, client.get_max_batch_size()))
+    flush = partial(_flush_window, collection, embedder, device, embed_cache, embed_model, upsert_batch=upsert_batch)
+    ids: List[str] = []
+    metadatas: List[Dict[str, object]] = []
+    documents: List[str] = []
+
+    # Recursively read .txt files (sorted for consistent order).
+    # Worker threads read + parse + chunk ahead while this thread embeds;
+    # map() still yields results in sorted order.
+    load = partial(_load_and_chunk, policies_root=policies_root, max_chars=max_chars, overlap=overlap)
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        for loaded in pool.map(load, sorted(policies_root.rglob("*.txt"))):
+            if loaded is None:
+                continue
+            file_path, metadata_base, chunks = loaded
+
+            for i, chunk in enumerate(chunks):
+                # Deterministic (no os.urandom per chunk): reruns produce the same ids
+                chunk_id = f"{file_path.stem}__{i}__{chunk_id_hash(metadata_base['source_file'], i, chunk)}"
+                ids.append(chunk_id)
+
+                md = dict(metadata_base)
+                md["chunk_index"] = i
+                metadatas.append(md)
+
+                documents.append(chunk)
+
+                if len(ids) >= ENCODE_WINDOW:
+                    flush(ids, documents, metadatas)
+                    ids, metadatas, documents = [], [], []
+
+            files_ingested += 1
+            chunks_ingested += len(chunks)
+
+    if ids:
+        flush(ids, documents, metadatas)
+
+    embed_cache.close()
     return files_ingested, chunks_ingested
 
 
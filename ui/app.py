@@ -12,6 +12,7 @@ import re
 import time
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
 
 API_URL = "http://127.0.0.1:8000"
 
@@ -19,16 +20,66 @@ API_URL = "http://127.0.0.1:8000"
 # -----------------------------------------------------------------------------
 # Text cleaning
 # -----------------------------------------------------------------------------
+# Compiled once at import; clean_text runs on every streaming UI update.
+# All citation artifacts are stripped in one alternation pass (the lookahead
+# lets the scanner skip positions that cannot start any branch), then one
+# whitespace pass whose callback only fires on runs that actually change.
+_RE_STRIP = re.compile(
+    r"(?=[:.\s\[{cC])(?:[:.]?\s*conte(?:ntReference)?\b|\[oaicite:\d+\](?:\{index=\d+\})?|\{index=\d+\})",
+    re.IGNORECASE,
+)
+_RE_WS = re.compile(r" [ \t]+|\t[ \t]*|\n\n\n+")
+
+
+def _collapse_ws(m: "re.Match[str]") -> str:
+    return "\n\n" if m.group()[0] == "\n" else " "
+
+
+def _clean_raw(s: str) -> str:
+    s = _RE_STRIP.sub("", s)
+    return _RE_WS.sub(_collapse_ws, s)
+
+
 def clean_text(s: str) -> str:
-    s = s or ""
-    s = re.sub(r"\[oaicite:\d+\]\{index=\d+\}", "", s)
-    s = re.sub(r"\[oaicite:\d+\]", "", s)
-    s = re.sub(r"\{index=\d+\}", "", s)
-    s = re.sub(r"[:.]?\s*contentReference\b", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"[:.]?\s*conte\b", "", s, flags=re.IGNORECASE)
-    s = re.sub(r"[ \t]+", " ", s)
-    s = re.sub(r"\n{3,}", "\n\n", s)
-    return s.strip()
+    return _clean_raw(s or "").strip()
+
+
+# A newline followed by a character that is neither whitespace nor able to
+# start a _RE_STRIP match: no strip or whitespace match can span it, so the
+# text before it can be cleaned once and never looked at again.
+_NO_CUT_AFTER_NL = frozenset(":.[{cC")
+
+
+def _safe_cut(s: str) -> int:
+    i = s.rfind("\n", 0, len(s) - 1)
+    while i >= 0:
+        nxt = s[i + 1]
+        if not nxt.isspace() and nxt not in _NO_CUT_AFTER_NL:
+            return i + 1
+        i = s.rfind("\n", 0, i)
+    return 0
+
+
+class StreamCleaner:
+    """
+    clean_text() for a growing stream: only the tail after the last safe cut
+    is re-cleaned per render, so each update costs O(tail) instead of O(answer).
+    text() always equals clean_text(<everything fed so far>).
+    """
+
+    def __init__(self) -> None:
+        self._cleaned = ""
+        self._tail = ""
+
+    def feed(self, chunk: str) -> None:
+        self._tail += chunk
+        cut = _safe_cut(self._tail)
+        if cut:
+            self._cleaned += _clean_raw(self._tail[:cut])
+            self._tail = self._tail[cut:]
+
+    def text(self) -> str:
+        return (self._cleaned + _clean_raw(self._tail)).strip()
 
 
 # -----------------------------------------------------------------------------
@@ -50,9 +101,20 @@ def build_conversation_history(messages, max_turns: int = 12):
 # -----------------------------------------------------------------------------
 # Backend readiness
 # -----------------------------------------------------------------------------
+@st.cache_resource
+def _http_session() -> requests.Session:
+    """
+    One keep-alive session shared across reruns (Streamlit re-executes this
+    file on every interaction, so a plain module global would not survive).
+    """
+    session = requests.Session()
+    session.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+    return session
+
+
 def backend_health():
     try:
-        r = requests.get(f"{API_URL}/health", timeout=3)
+        r = _http_session().get(f"{API_URL}/health", timeout=3)
         if "application/json" in r.headers.get("content-type", ""):
             return r.json()
     except Exception:
@@ -83,7 +145,7 @@ def call_backend_stream(message: str):
     timeout_s = 600 if not backend_ready() else 300
 
     try:
-        r = requests.post(
+        r = _http_session().post(
             f"{API_URL}/chat_stream",
             json={"message": message, "conversation_history": conversation_history},
             timeout=timeout_s,
@@ -229,23 +291,33 @@ if user_input:
 
             placeholder = st.empty()
             accum = ""
+            cleaner = StreamCleaner()
             last_render_t = time.time()
             last_render_len = 0
+            # Every markdown() call re-sends the whole answer over the websocket,
+            # so skip it when cleaning left the visible text unchanged
+            rendered = ""
 
             try:
                 for chunk in stream_resp.iter_content(chunk_size=4096, decode_unicode=True):
                     if not chunk:
                         continue
                     accum += chunk
+                    cleaner.feed(chunk)
 
                     now = time.time()
                     # ✅ smoother: update ~2 times/sec OR every ~400 chars
                     if (now - last_render_t) >= 0.50 or (len(accum) - last_render_len) >= 400:
-                        placeholder.markdown(clean_text(accum))
+                        text = cleaner.text()
+                        if text != rendered:
+                            placeholder.markdown(text)
+                            rendered = text
                         last_render_t = now
                         last_render_len = len(accum)
 
-                placeholder.markdown(clean_text(accum))
+                text = cleaner.text()
+                if text != rendered:
+                    placeholder.markdown(text)
             finally:
                 try:
                     stream_resp.close()